@@ -0,0 +1,333 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+EVICT_INTERVAL = 5.0  # 后台整理间隔（秒）
+EVICT_LOW_WATERMARK = 0.9  # 超出预算后清理到预算的 90%，避免频繁触发
+MEMORY_MAX_BYTES = 32 * 1024 * 1024  # 内存中保留的最近音频字节数
+
+
+# 缓存键：由文本、语音、语速决定，拼写相同的单词共用同一段音频
+def make_key(text, voice, rate):
+    raw = f"{text.strip()}\0{voice}\0{rate}".encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+
+# 缓存目录下音频文件的位置（按键的前两位分子目录），离线预生成的工作进程也使用同样的布局
+def audio_file_path(root, key):
+    return Path(root) / key[:2] / f"{key}.wav"
+
+
+# 写入用的临时文件，写完后原子改名为正式文件
+def part_file_path(root, key):
+    part_file = Path(root) / key[:2] / f".{key}.{uuid.uuid4().hex}.part.wav"
+    part_file.parent.mkdir(exist_ok=True, parents=True)
+    return part_file
+
+
+# 内容寻址的音频缓存：清单索引 + 字节预算 + LRU 淘汰，淘汰和清单落盘都在后台线程完成
+class AudioCache:
+    def __init__(self, root, max_bytes, memory_max_bytes=MEMORY_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(exist_ok=True, parents=True)
+        self.manifest_file = self.root / MANIFEST_NAME
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.total_bytes = 0
+        self.dirty = False
+        self.clear_requested = False
+        self.wakeup = threading.Event()
+
+        # 最近使用的音频内容，重复播放时不再读磁盘
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.memory_max_bytes = memory_max_bytes
+
+        self._load_manifest()
+
+        self.worker = threading.Thread(target=self._run, name="audio-cache", daemon=True)
+        self.worker.start()
+        atexit.register(self.save_manifest)
+
+    def path_for(self, key):
+        return audio_file_path(self.root, key)
+
+    # 写入用的临时文件，写完后通过 commit 原子改名
+    def part_path(self, key):
+        return part_file_path(self.root, key)
+
+    # 查询缓存，命中时更新访问时间和命中次数，返回文件路径
+    def lookup(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return self._adopt(key)
+            entry["hits"] += 1
+            entry["last_access"] = time.time()
+            self.dirty = True
+        audio_file = self.path_for(key)
+        if audio_file.exists():
+            return audio_file
+        # 文件被外部删除，清单同步移除
+        with self.lock:
+            self._drop_entry(key)
+        return None
+
+    # 读取音频内容，优先使用内存中的副本
+    def read(self, key):
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                entry = self.entries.get(key)
+                if entry is not None:
+                    entry["hits"] += 1
+                    entry["last_access"] = time.time()
+                    self.dirty = True
+                return data
+
+        audio_file = self.lookup(key)
+        if audio_file is None:
+            return None
+        try:
+            data = audio_file.read_bytes()
+        except OSError:
+            return None
+
+        with self.lock:
+            if key in self.entries and len(data) <= self.memory_max_bytes:
+                self._forget(key)
+                self.memory[key] = data
+                self.memory_bytes += len(data)
+                while self.memory_bytes > self.memory_max_bytes:
+                    _, old = self.memory.popitem(last=False)
+                    self.memory_bytes -= len(old)
+        return data
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    # 把写好的临时文件原子地放到最终位置并登记
+    def commit(self, key, part_file, text, voice, rate):
+        audio_file = self.path_for(key)
+        os.replace(part_file, audio_file)
+        size = audio_file.stat().st_size
+        with self.lock:
+            self._drop_entry(key)
+            self.entries[key] = {
+                "text": text,
+                "voice": voice,
+                "rate": rate,
+                "size": size,
+                "hits": 0,
+                "last_access": time.time(),
+            }
+            self.total_bytes += size
+            self.dirty = True
+            over_budget = self.total_bytes > self.max_bytes
+        if over_budget:
+            self.wakeup.set()
+        return audio_file
+
+    # 登记已经在最终位置的文件（例如运行期间由离线预生成命令写入的文件），调用方需持有锁
+    def _adopt(self, key, text=None, voice=None, rate=None):
+        if self.clear_requested:
+            return None
+        audio_file = self.path_for(key)
+        try:
+            size = audio_file.stat().st_size
+        except OSError:
+            return None
+        self.entries[key] = {
+            "text": text,
+            "voice": voice,
+            "rate": rate,
+            "size": size,
+            "hits": 1,
+            "last_access": time.time(),
+        }
+        self.total_bytes += size
+        self.dirty = True
+        if self.total_bytes > self.max_bytes:
+            self.wakeup.set()
+        return audio_file
+
+    # 登记已写入最终位置的音频（已登记时只补全文本、语音、语速信息）
+    def register(self, key, text, voice, rate):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.update(text=text, voice=voice, rate=rate)
+                self.dirty = True
+                return self.path_for(key)
+            audio_file = self._adopt(key, text, voice, rate)
+            if audio_file is not None:
+                self.entries[key]["hits"] = 0
+            return audio_file
+
+    # 移除单个条目（强制重新生成时使用）
+    def discard(self, key):
+        with self.lock:
+            self._drop_entry(key)
+        self._unlink(self.path_for(key))
+
+    # 清空缓存：立即从索引中移除，文件在后台删除；返回移除的条目数
+    def clear(self):
+        with self.lock:
+            count = len(self.entries)
+            self.entries = {}
+            self.total_bytes = 0
+            self.memory.clear()
+            self.memory_bytes = 0
+            self.dirty = True
+            self.clear_requested = True
+        self.wakeup.set()
+        return count
+
+    def stats(self):
+        with self.lock:
+            return {
+                "files": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": sum(entry["hits"] for entry in self.entries.values()),
+                "memory_bytes": self.memory_bytes,
+            }
+
+    # 清单落盘：先写临时文件再改名
+    def save_manifest(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = json.dumps(self.entries, ensure_ascii=False)
+            self.dirty = False
+        tmp_file = self.manifest_file.with_name(f".{MANIFEST_NAME}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_file, self.manifest_file)
+        except OSError:
+            self.dirty = True
+            self._unlink(tmp_file)
+
+    # 读取清单，并与磁盘上的实际文件对账（清单丢失或损坏时按文件重建）
+    def _load_manifest(self):
+        entries = {}
+        if self.manifest_file.exists():
+            try:
+                with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = {}
+
+        on_disk = {}
+        for audio_file in self.root.glob("??/*.wav"):
+            if not audio_file.name.startswith("."):
+                on_disk[audio_file.stem] = audio_file
+
+        for key, audio_file in on_disk.items():
+            stat = audio_file.stat()
+            entry = entries.get(key)
+            if entry is None:
+                entry = {"text": None, "voice": None, "rate": None, "hits": 0,
+                         "last_access": stat.st_mtime}
+                self.dirty = True
+            entry["size"] = stat.st_size
+            self.entries[key] = entry
+            self.total_bytes += stat.st_size
+
+        if len(self.entries) != len(entries):
+            self.dirty = True
+
+    def _drop_entry(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry["size"]
+            self.dirty = True
+        self._forget(key)
+
+    def _forget(self, key):
+        data = self.memory.pop(key, None)
+        if data is not None:
+            self.memory_bytes -= len(data)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+
+    # 按最近访问时间淘汰，直到低于预算的低水位
+    def _evict(self):
+        with self.lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            target = self.max_bytes * EVICT_LOW_WATERMARK
+            victims = []
+            for key, entry in sorted(self.entries.items(), key=lambda item: item[1]["last_access"]):
+                if self.total_bytes <= target:
+                    break
+                victims.append(key)
+                self._drop_entry(key)
+        for key in victims:
+            self._unlink(self.path_for(key))
+
+    # 删除不在索引中的文件（清空缓存、旧版 {id}_{gender}_{speed}.wav 文件、残留的临时文件）
+    def _sweep(self):
+        with self.lock:
+            keep = set(self.entries)
+        for audio_file in list(self.root.glob("*.wav")) + list(self.root.glob("??/*.wav")):
+            if audio_file.name.startswith("."):
+                # 一小时前的临时文件视为中断写入的残留
+                try:
+                    if time.time() - audio_file.stat().st_mtime < 3600:
+                        continue
+                except OSError:
+                    continue
+            elif audio_file.parent != self.root and audio_file.stem in keep:
+                continue
+            self._unlink(audio_file)
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(EVICT_INTERVAL)
+            self.wakeup.clear()
+            try:
+                if self.clear_requested:
+                    self.clear_requested = False
+                    self._sweep()
+                self._evict()
+                self.save_manifest()
+            except Exception:
+                # 后台整理失败不影响页面，下个周期重试
+                pass
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+# 获取进程级共享的音频缓存
+def get_audio_cache(root, max_bytes):
+    key = str(Path(root).resolve())
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = AudioCache(root, max_bytes)
+            _caches[key] = cache
+        else:
+            cache.max_bytes = max_bytes
+    return cache
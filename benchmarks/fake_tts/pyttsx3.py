@@ -0,0 +1,56 @@
+# 压力测试用的假 pyttsx3：接口与应用用到的部分一致，不调用系统语音库
+# 每个单词写出一段 16 位 PCM 正弦波（长度随单词长度变化），FAKE_TTS_DELAY 可模拟每段的合成耗时（秒）
+import math
+import os
+import struct
+import time
+import wave
+
+SAMPLE_RATE = 16000
+DELAY = float(os.environ.get("FAKE_TTS_DELAY", "0"))
+
+
+class Voice:
+    def __init__(self, voice_id, name, gender):
+        self.id = voice_id
+        self.name = name
+        self.gender = gender
+
+
+VOICES = [Voice("fake-female", "Fake Female", "Female"), Voice("fake-male", "Fake Male", "Male")]
+
+
+class Engine:
+    def __init__(self):
+        self.properties = {"voices": VOICES, "voice": VOICES[0].id, "rate": 150}
+        self.queue = []
+
+    def getProperty(self, name):
+        return self.properties.get(name)
+
+    def setProperty(self, name, value):
+        self.properties[name] = value
+
+    def save_to_file(self, text, filename):
+        self.queue.append((text, filename))
+
+    def runAndWait(self):
+        queue, self.queue = self.queue, []
+        for text, filename in queue:
+            if DELAY:
+                time.sleep(DELAY)
+            frames = int(SAMPLE_RATE * min(1.0, 0.05 * max(1, len(text))) * 150 / self.properties["rate"])
+            pcm = b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / SAMPLE_RATE)))
+                           for i in range(frames))
+            with wave.open(filename, "wb") as writer:
+                writer.setnchannels(1)
+                writer.setsampwidth(2)
+                writer.setframerate(SAMPLE_RATE)
+                writer.writeframes(pcm)
+
+    def stop(self):
+        self.queue = []
+
+
+def init(driverName=None, debug=False):
+    return Engine()
@@ -0,0 +1,359 @@
+# 多会话压力测试：用 streamlit.testing 的 AppTest 在同一进程里无界面运行 streamlit_app.py，
+# 模拟多个学习者同时在单词卡片、选择题、拼写测试之间轮换答题
+#
+#   python benchmarks/load_test.py                                   # 8 个会话，4 个学习者，每个会话 30 次作答
+#   python benchmarks/load_test.py --sessions 32 --users 16 --actions 50 --processes 4 --backend json
+#   python benchmarks/load_test.py --words 100000 --think 0.2 --output load.json
+#
+# 每个会话一个线程，进程内的词库、进度、音频缓存等单例被所有会话共享，相当于一个 Streamlit 服务器进程；
+# AppTest 不支持在同一进程里并发运行脚本，进程内的脚本运行依次排队（延迟包含排队时间，service 为脚本本身的耗时）。
+# --processes 大于 1 时会话分到多个进程，相当于多个服务器进程共用 users/，同一学习者的会话分布在不同进程里。
+# 语音合成使用 benchmarks/fake_tts 中的假 pyttsx3。
+# 结果以 JSON 输出：每次交互（一次脚本运行）的 p50/p95 延迟、每秒作答数，以及丢失的答题记录数
+# （选择题、拼写的答题次数与写入存储的正确/错误次数之差）。同一个种子在 --sessions 1 时结果完全可复现，
+# 多个会话时线程调度会让抽到的单词顺序有所不同。丢失记录或脚本出错时进程以状态码 1 退出
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+APP_FILE = ROOT / "streamlit_app.py"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR / "fake_tts"))
+
+import bootstrap
+from progress_store import SQLITE_FILE_NAME, JsonProgressBackend, SqliteProgressBackend, get_user_registry
+from run_benchmarks import make_vocabulary
+
+MODES = {"flashcard": "单词卡片", "quiz": "选择题", "spelling": "拼写测试"}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+# 先到先得的锁：会话依次运行脚本，刚运行完的会话不会立即再次抢到锁
+class FifoLock:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.next_ticket = 0
+        self.serving = 0
+
+    def __enter__(self):
+        with self.condition:
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            self.condition.wait_for(lambda: self.serving == ticket)
+
+    def __exit__(self, *exc_info):
+        with self.condition:
+            self.serving += 1
+            self.condition.notify_all()
+
+
+def _widget(at, kind, key):
+    try:
+        return getattr(at, kind)(key=key)
+    except KeyError:
+        return None
+
+
+# 一个模拟学习者会话：登录后按顺序轮换学习模式，每种模式连续作答若干次
+class Session:
+    def __init__(self, index, user, rng, args, run_lock):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.user = user
+        self.rng = rng
+        self.args = args
+        self.run_lock = run_lock
+        self.at = AppTest.from_file(str(APP_FILE), default_timeout=args.timeout)
+        self.latencies = []  # (交互类型, 等待 + 运行秒数, 运行秒数)
+        self.answers = Counter()  # 各模式的作答次数
+        self.graded = 0  # 选择题、拼写的答题次数（应当全部写入存储）
+        self.errors = []
+
+    # 运行一次脚本并记录耗时
+    def run(self, kind):
+        started = time.perf_counter()
+        with self.run_lock:
+            running = time.perf_counter()
+            self.at.run()
+        finished = time.perf_counter()
+        self.latencies.append((kind, finished - started, finished - running))
+        for exception in self.at.exception:
+            self.errors.append(f"[{self.user}/{kind}] {exception.message}")
+        return not self.at.exception
+
+    def think(self):
+        if self.args.think:
+            time.sleep(self.rng.expovariate(1 / self.args.think))
+
+    def login(self):
+        self.run("open")
+        self.at.selectbox(key="select_user").select(self.user)
+        self.run("login")
+
+    def switch(self, mode):
+        self.at.radio(key="radio_study_mode").set_value(MODES[mode])
+        self.run("switch")
+
+    # 直接换下一个单词（选择题、拼写的「下一题」按钮嵌套在提交按钮的分支里，点击后不会生效）
+    def next_word(self):
+        self.at.session_state["current_word"] = None
+        self.run("next")
+
+    def answer(self, mode):
+        correct = self.rng.random() < self.args.accuracy
+        if mode == "flashcard":
+            button = _widget(self.at, "button", "btn_know" if correct else "btn_dont_know")
+            if button is None:
+                return self.next_word()
+            button.click()
+            if self.run("answer"):
+                self.answers[mode] += 1
+            button = _widget(self.at, "button", "btn_next_word")
+            if button is not None:
+                button.click()
+                self.run("next")
+            return
+
+        word = self.at.session_state["current_word"] if "current_word" in self.at.session_state else None
+        if word is None:
+            return self.next_word()
+        if mode == "quiz":
+            radio = _widget(self.at, "radio", "radio_quiz_options")
+            if radio is None:
+                return self.next_word()
+            expected = self.at.session_state["quiz_answer"]
+            wrong = [option for option in radio.options if option != expected]
+            radio.set_value(expected if correct or not wrong else self.rng.choice(wrong))
+            submit = "btn_submit_quiz"
+        else:
+            text = _widget(self.at, "text_input", "input_spelling")
+            if text is None:
+                return self.next_word()
+            text.input(word["en"] if correct else word["en"] + "x")
+            submit = "btn_check_spelling"
+        self.at.button(key=submit).click()
+        if self.run("answer"):
+            self.answers[mode] += 1
+            self.graded += 1
+        self.next_word()
+
+    def play(self):
+        self.login()
+        modes = list(MODES)
+        done = 0
+        while done < self.args.actions:
+            mode = modes[(done // self.args.per_mode) % len(modes)]
+            if done % self.args.per_mode == 0:
+                self.switch(mode)
+            self.think()
+            self.answer(mode)
+            done += 1
+
+
+# 读取存储中每个学习者的答题总次数（新建后端实例，直接读磁盘上的数据）
+def persisted_answers(user_dir, backend, users):
+    if backend == "sqlite":
+        store = SqliteProgressBackend(user_dir / SQLITE_FILE_NAME)
+    else:
+        store = JsonProgressBackend(user_dir)
+    totals = {}
+    for user in users:
+        stats = store.load(user)["word_stats"]
+        totals[user] = sum(record.get("correct", 0) + record.get("wrong", 0) for record in stats.values())
+    if hasattr(store, "close"):
+        store.close()
+    return totals
+
+
+# 准备工作目录：词库文件和学习者
+def prepare(args, workdir):
+    if args.words:
+        words = make_vocabulary(args.words, random.Random(args.seed))
+        (workdir / "main.json").write_text(json.dumps(words, ensure_ascii=False), encoding="utf-8")
+    else:
+        shutil.copy(ROOT / "main.json", workdir / "main.json")
+    user_dir = workdir / "users"
+    user_dir.mkdir(exist_ok=True)
+    store = SqliteProgressBackend(user_dir / SQLITE_FILE_NAME) if args.backend == "sqlite" else JsonProgressBackend(user_dir)
+    users = [f"learner{i:03d}" for i in range(args.users)]
+    for user in users:
+        store.create(user)
+    if hasattr(store, "close"):
+        store.close()
+    return users
+
+
+# 在当前进程里运行一组会话（相当于一个服务器进程），返回每个会话的结果
+def run_sessions(args, workdir, users, indices):
+    # 应用使用相对路径（users/、audio/、main.json），在工作目录里运行
+    os.chdir(workdir)
+    os.environ["PROGRESS_BACKEND"] = args.backend
+    os.environ["WORD_LIBRARY_DIR"] = str(Path(workdir) / "books")
+    # 假引擎不依赖系统语音库，直接标记为可用
+    bootstrap._tts_status = {"available": True, "driver": "fake", "error": None, "seconds": 0.0}
+    random.seed(f"{args.seed}:{indices[0] if indices else 0}")
+
+    run_lock = FifoLock()
+    sessions = [Session(i, users[i % len(users)], random.Random(f"{args.seed}:{i}"), args, run_lock)
+                for i in indices]
+    failures = {}
+
+    def play(session):
+        try:
+            session.play()
+        except Exception as e:
+            failures[session.index] = f"[{session.user}] {type(e).__name__}: {e}"
+
+    threads = [threading.Thread(target=play, args=(session,), name=f"load-{session.index}") for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 写入尚未落盘的进度，之后才能核对存储中的记录
+    get_user_registry(Path("users"), args.backend).flush()
+    return [{
+        "user": session.user,
+        "latencies": session.latencies,
+        "answers": dict(session.answers),
+        "graded": session.graded,
+        "errors": session.errors + ([failures[session.index]] if session.index in failures else []),
+    } for session in sessions]
+
+
+def run_load_test(args, workdir):
+    users = prepare(args, workdir)
+    # 同一学习者的会话依次分到不同进程
+    groups = [[i for i in range(args.sessions) if (i // len(users)) % args.processes == p]
+              for p in range(args.processes)]
+    started = time.perf_counter()
+    # 会话总在子进程里运行：应用的单例使用相对路径，子进程在工作目录里启动和退出，不影响当前目录
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.processes, mp_context=context) as executor:
+        futures = [executor.submit(run_sessions, args, str(workdir), users, group) for group in groups if group]
+        results = [result for future in futures for result in future.result()]
+    elapsed = time.perf_counter() - started
+
+    expected = Counter()
+    answers = Counter()
+    by_kind = {}
+    latencies = []
+    service = []
+    errors = []
+    for result in results:
+        expected[result["user"]] += result["graded"]
+        answers.update(result["answers"])
+        errors.extend(result["errors"])
+        for kind, seconds, running in result["latencies"]:
+            latencies.append(seconds)
+            service.append(running)
+            by_kind.setdefault(kind, []).append(seconds)
+    stored = persisted_answers(workdir / "users", args.backend, users)
+    lost = sum(max(0, expected[user] - stored[user]) for user in users)
+    duplicated = sum(max(0, stored[user] - expected[user]) for user in users)
+    total_answers = sum(answers.values())
+
+    def summary(values):
+        return {
+            "runs": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+            "p95_ms": round(percentile(values, 95) * 1000, 2) if values else None,
+            "max_ms": round(max(values) * 1000, 2) if values else None,
+        }
+
+    return {
+        "latency": summary(latencies),
+        "service": summary(service),
+        "latency_by_kind": {kind: summary(values) for kind, values in sorted(by_kind.items())},
+        "answers": dict(answers),
+        "answers_per_second": round(total_answers / elapsed, 2) if elapsed else None,
+        "elapsed_seconds": round(elapsed, 3),
+        "graded_answers": sum(expected.values()),
+        "stored_answers": sum(stored.values()),
+        "lost_updates": lost,
+        "duplicated_updates": duplicated,
+        "errors": len(errors),
+        "error_samples": errors[:10],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="英语单词背诵工具多会话压力测试（streamlit.testing AppTest）")
+    parser.add_argument("--sessions", type=int, default=8, help="同时在线的会话数（默认 8）")
+    parser.add_argument("--users", type=int, help="学习者数量，多个会话可以属于同一学习者（默认会话数的一半）")
+    parser.add_argument("--processes", type=int, default=1, help="模拟的服务器进程数（默认 1）")
+    parser.add_argument("--actions", type=int, default=30, help="每个会话的作答次数（默认 30）")
+    parser.add_argument("--per-mode", type=int, default=5, help="切换学习模式前连续作答的次数（默认 5）")
+    parser.add_argument("--accuracy", type=float, default=0.7, help="模拟学习者答对的概率（默认 0.7）")
+    parser.add_argument("--think", type=float, default=0.0, help="两次作答之间的平均思考时间（秒，默认 0）")
+    parser.add_argument("--backend", choices=("sqlite", "json"), default="sqlite", help="学习进度存储方式")
+    parser.add_argument("--words", type=int, default=0, help="使用指定数量的合成词条（默认使用 main.json）")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单次脚本运行的超时（秒）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果写入的 JSON 文件（默认输出到标准输出）")
+    parser.add_argument("--keep", action="store_true", help="保留工作目录（users/、audio/）便于检查")
+    args = parser.parse_args(argv)
+    args.users = max(1, args.users or args.sessions // 2)
+    args.per_mode = max(1, args.per_mode)
+    args.processes = max(1, args.processes)
+    output = Path(args.output).resolve() if args.output else None
+
+    workdir = Path(tempfile.mkdtemp(prefix="word_load_"))
+    try:
+        results = run_load_test(args, workdir)
+    finally:
+        if args.keep:
+            print(f"工作目录: {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sessions": args.sessions,
+            "users": args.users,
+            "processes": args.processes,
+            "actions": args.actions,
+            "backend": args.backend,
+            "words": args.words or "main.json",
+            "think": args.think,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        output.write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+    if results["lost_updates"] or results["errors"]:
+        print(f"丢失 {results['lost_updates']} 条答题记录，{results['errors']} 个错误", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
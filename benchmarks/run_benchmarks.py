@@ -0,0 +1,259 @@
+# 核心学习逻辑的无界面基准测试（不需要启动 Streamlit）
+#
+#   python benchmarks/run_benchmarks.py                         # 1k / 100k
+#   python benchmarks/run_benchmarks.py --sizes 1000,100000,1000000
+#   python benchmarks/run_benchmarks.py --output new.json --baseline old.json --tolerance 0.25
+#
+# 结果以 JSON 输出；指定 --baseline 时逐项比较，变慢超过容差的项目会让进程以状态码 1 退出
+import argparse
+import json
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_cache import AudioCache, make_key
+from compiled_vocab import CompiledVocabulary, compile_vocabulary
+from distractors import DistractorIndex
+from progress_store import JsonProgressBackend, ProgressAggregates, SqliteProgressBackend
+from sampler import WeightedSampler, get_weighted_random_word
+from scheduler import DueQueue
+from stats_table import StatsTable
+from word_store import Vocabulary, filter_words
+
+TYPES = ["n.", "adj.", "vt.", "vi.", "adv.", "phrase", "vt. & vi.", "abbr."]
+AUDIO_ENTRIES = 2000  # 音频缓存基准使用的真实文件数量上限
+
+
+# 生成合成词条：单元、词性分布大致与 main.json 相同，释义有一定比例重复
+def make_vocabulary(size, rng):
+    units = max(5, size // 80)
+    meanings = [f"释义{i}；含义{i % 97}" for i in range(max(10, size * 9 // 10))]
+    words = []
+    for i in range(1, size + 1):
+        words.append({
+            "en": "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 12))),
+            "zh": rng.choice(meanings),
+            "unit": str(rng.randint(1, units)),
+            "type": rng.choice(TYPES),
+            "id": i,
+        })
+    return words
+
+
+# 生成合成学习记录：约一半单词练习过，约 10% 标记为已掌握
+def make_history(vocab, rng):
+    word_stats = {}
+    known_words = {}
+    for word in vocab:
+        word_id = str(word["id"])
+        if rng.random() < 0.5:
+            word_stats[word_id] = {"correct": rng.randint(0, 8), "wrong": rng.randint(0, 5)}
+        if rng.random() < 0.1:
+            known_words[word_id] = True
+    return {"known_words": known_words, "word_stats": word_stats}
+
+
+# 每次调用的耗时（秒）：自动确定循环次数后重复测量取中位数
+def measure(fn, repeat=5):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    samples = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {"seconds_per_call": statistics.median(samples), "min": min(samples), "calls": number * repeat}
+
+
+# 旧版“最难单词”计算：遍历全部统计并整体排序
+def hardest_words_full_sort(vocab, word_stats, k=5):
+    hardest = []
+    for word_id, stats in word_stats.items():
+        word = vocab.get(word_id)
+        total = stats["correct"] + stats["wrong"]
+        if word and total > 0:
+            hardest.append((word, stats["wrong"] / total))
+    hardest.sort(key=lambda item: item[1], reverse=True)
+    return hardest[:k]
+
+
+def hardest_words_aggregates(vocab, aggregates, k=5):
+    hardest = []
+    for word_id, error_rate in aggregates.iter_hardest():
+        word = vocab.get(word_id)
+        if word:
+            hardest.append((word, error_rate))
+            if len(hardest) == k:
+                break
+    return hardest
+
+
+def bench_size(size, rng, workdir, include_legacy):
+    results = {}
+
+    def run(name, fn, repeat=5):
+        results[f"{name}[{size}]"] = measure(fn, repeat)
+
+    raw_words = make_vocabulary(size, rng)
+    started = time.perf_counter()
+    vocab = Vocabulary(raw_words)
+    results[f"build_vocabulary[{size}]"] = {"seconds_per_call": time.perf_counter() - started, "calls": 1}
+    history = make_history(vocab, rng)
+
+    # 词库加载：JSON 整体解析 vs 编译后的内存映射文件
+    json_file = workdir / f"words_{size}.json"
+    json_file.write_text(json.dumps(raw_words, ensure_ascii=False), encoding="utf-8")
+    compiled_file = compile_vocabulary(raw_words, workdir / f"words_{size}.vocab")
+    del raw_words
+
+    def load_json():
+        with open(json_file, "r", encoding="utf-8") as f:
+            return Vocabulary(json.load(f))
+
+    run("load_vocabulary_json", load_json, repeat=3)
+    run("load_vocabulary_compiled", lambda: CompiledVocabulary(compiled_file), repeat=3)
+    word_stats = history["word_stats"]
+    units = vocab.units[:2]
+
+    # 筛选
+    run("select_unit_type_uncached", lambda: vocab.select(units, ["n."]))
+    run("apply_filters_unit_type", lambda: filter_words(vocab, units, ["n."]))
+    run("apply_filters_review", lambda: filter_words(vocab, units, None, history["known_words"]))
+    filtered = filter_words(vocab, units, None)
+
+    # 选词
+    if include_legacy:
+        run("get_weighted_random_word", lambda: get_weighted_random_word(vocab, word_stats), repeat=3)
+    stats_table = StatsTable(word_stats)
+    run("sampler_build_dict", lambda: WeightedSampler(vocab, word_stats), repeat=3)
+    run("sampler_build_table", lambda: WeightedSampler(vocab, stats_table), repeat=3)
+    run("due_queue_build_table", lambda: DueQueue(vocab, stats_table), repeat=3)
+    sampler = WeightedSampler(vocab, word_stats)
+    run("sampler_draw", sampler.sample)
+    sample_ids = [str(rng.randint(1, size)) for _ in range(1024)]
+    counter = iter(range(10 ** 12))
+    run("sampler_update", lambda: sampler.update(
+        sample_ids[next(counter) % 1024], {"correct": rng.randint(0, 5), "wrong": rng.randint(0, 5)}))
+    due_queue = DueQueue(vocab, word_stats)
+    run("due_queue_pop", lambda: due_queue.pop_due(now=0.0) or due_queue.update(
+        sample_ids[next(counter) % 1024], {"correct": 1, "wrong": 0, "due": 0.0}))
+
+    # 选择题选项
+    started = time.perf_counter()
+    distractors = DistractorIndex(filtered)
+    results[f"build_distractor_index[{size}]"] = {"seconds_per_call": time.perf_counter() - started, "calls": 1}
+    quiz_words = [rng.choice(filtered) for _ in range(256)]
+    run("generate_quiz_options", lambda: distractors.options_for(quiz_words[next(counter) % 256]))
+
+    # 最难单词
+    aggregates = ProgressAggregates(history)
+    run("hardest_words_aggregates", lambda: hardest_words_aggregates(vocab, aggregates))
+
+    # 每次答题后侧边栏重新读取最难单词：先修改一个单词的计数再查询，排序不会命中缓存
+    def answer_then_hardest():
+        record = aggregates.table.setdefault(sample_ids[next(counter) % 1024], {"correct": 0, "wrong": 0})
+        record["wrong"] += 1
+        return hardest_words_aggregates(vocab, aggregates)
+
+    run("hardest_words_after_update", answer_then_hardest)
+    run("hardest_words_full_sort", lambda: hardest_words_full_sort(vocab, word_stats), repeat=3)
+
+    # 学习进度读写
+    sqlite_backend = SqliteProgressBackend(workdir / f"progress_{size}.db")
+    sqlite_backend.replace("bench", history)
+    run("sqlite_record_answer", lambda: sqlite_backend.apply(
+        "bench", [("answer", sample_ids[next(counter) % 1024], True)]))
+    run("sqlite_load_user_data", lambda: sqlite_backend.load("bench"), repeat=3)
+    sqlite_backend.close()
+    if include_legacy:
+        json_backend = JsonProgressBackend(workdir / f"json_{size}")
+        run("json_save_user_data", lambda: json_backend.replace("bench", history), repeat=3)
+        run("json_load_user_data", lambda: json_backend.load("bench"), repeat=3)
+
+    # 音频缓存
+    cache = AudioCache(workdir / f"audio_{size}", max_bytes=1 << 40)
+    keys = []
+    for word in list(vocab)[:min(size, AUDIO_ENTRIES)]:
+        key = make_key(word["en"], "female", 150)
+        part_file = cache.part_path(key)
+        part_file.write_bytes(b"RIFF" + bytes(256))
+        cache.commit(key, part_file, word["en"], "female", 150)
+        keys.append(key)
+    run("audio_cache_lookup", lambda: cache.lookup(keys[next(counter) % len(keys)]))
+    run("audio_cache_read", lambda: cache.read(keys[next(counter) % len(keys)]))
+    run("audio_cache_miss", lambda: cache.lookup("0" * 40))
+
+    return results
+
+
+# 与基准结果比较，返回变慢超过容差的项目
+def compare(results, baseline, tolerance):
+    regressions = []
+    rows = []
+    for name, result in sorted(results.items()):
+        old = baseline.get("results", {}).get(name)
+        if not old or not old.get("seconds_per_call"):
+            continue
+        ratio = result["seconds_per_call"] / old["seconds_per_call"]
+        rows.append((name, old["seconds_per_call"], result["seconds_per_call"], ratio))
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    for name, old, new, ratio in rows:
+        flag = "  <-- 变慢" if name in regressions else ""
+        print(f"{name:45s} {old * 1e6:12.2f}us -> {new * 1e6:12.2f}us  x{ratio:.2f}{flag}", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="英语单词背诵工具核心逻辑基准测试")
+    parser.add_argument("--sizes", default="1000,100000", help="词库大小，逗号分隔，例如 1000,100000,1000000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果写入的 JSON 文件（默认输出到标准输出）")
+    parser.add_argument("--baseline", help="用于比较的基准结果 JSON 文件")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的变慢比例，默认 0.25")
+    parser.add_argument("--legacy-max-size", type=int, default=100000,
+                        help="超过该大小时跳过 O(n) 的旧版实现（整表权重、JSON 整体读写）")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    rng = random.Random(args.seed)
+    workdir = Path(tempfile.mkdtemp(prefix="word_bench_"))
+    results = {}
+    try:
+        for size in sizes:
+            print(f"running size {size}...", file=sys.stderr)
+            results.update(bench_size(size, rng, workdir, size <= args.legacy_max_size))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} 项性能回退: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
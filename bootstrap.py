@@ -0,0 +1,62 @@
+import ctypes.util
+import importlib.util
+import platform
+import threading
+import time
+
+# 进程级启动信息：Streamlit 每次交互都会重新执行脚本，但导入的模块只加载一次
+_process_started = time.time()
+_lock = threading.Lock()
+_tts_status = None
+_runs = {"first_run_seconds": None, "last_run_seconds": None, "runs": 0}
+
+
+# 检测语音合成能力（每个进程只检测一次）：只查找模块和系统库，不导入、不初始化引擎
+def detect_tts():
+    global _tts_status
+    with _lock:
+        if _tts_status is not None:
+            return _tts_status
+
+        started = time.perf_counter()
+        status = {"available": True, "driver": None, "error": None}
+        system = platform.system()
+        if importlib.util.find_spec("pyttsx3") is None:
+            status.update(available=False, error="未安装 pyttsx3")
+        elif system == "Linux":
+            library = ctypes.util.find_library("espeak-ng") or ctypes.util.find_library("espeak")
+            if library is None:
+                status.update(available=False, error="未找到 espeak 语音库")
+            status["driver"] = "espeak"
+        elif system == "Windows":
+            status["driver"] = "sapi5"
+        elif system == "Darwin":
+            status["driver"] = "nsss"
+        status["seconds"] = time.perf_counter() - started
+        _tts_status = status
+        return status
+
+
+# 引擎实际初始化失败时切换为静音模式
+def mark_tts_unavailable(error):
+    global _tts_status
+    detect_tts()
+    with _lock:
+        _tts_status = dict(_tts_status, available=False, error=str(error))
+
+
+# 记录一次脚本运行耗时，第一次运行即冷启动耗时
+def record_run(seconds):
+    with _lock:
+        if _runs["first_run_seconds"] is None:
+            _runs["first_run_seconds"] = seconds
+        _runs["last_run_seconds"] = seconds
+        _runs["runs"] += 1
+
+
+def startup_report():
+    with _lock:
+        report = dict(_runs)
+    report["uptime_seconds"] = time.time() - _process_started
+    report["tts"] = detect_tts()
+    return report
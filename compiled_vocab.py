@@ -0,0 +1,302 @@
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import uuid
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+
+from word_store import Vocabulary
+
+# 编译后的词库格式（小端）：
+#   文件头: 魔数 + 版本 + 元数据长度，元数据为 JSON（字段类型、各段位置、单元/词性分组）
+#   str_offsets: 字符串池偏移表 uint32 * (字符串数 + 1)
+#   str_pool:    去重后的 UTF-8 字符串
+#   col_<字段>:  每个单词该字段的字符串编号 uint32，MISSING 表示没有该字段
+#   id_order:    按 id 字符串排序的单词位置，用于按 id 二分查找
+#   group_positions: 按单元、词性分组后的单词位置（各组内升序）
+# 读取时整个文件通过 mmap 映射，多个进程共享同一份页缓存，启动时不解析单词数据
+MAGIC = b"WORDVOC\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII")
+FIELDS = ("en", "zh", "unit", "type", "id")
+GROUP_FIELDS = ("unit", "type")
+MISSING = 0xFFFFFFFF
+ALIGNMENT = 8
+
+if array.array("I").itemsize != 4:
+    raise ImportError("compiled vocabulary requires 32-bit unsigned array items")
+
+
+def _uint32_array(values):
+    data = array.array("I", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+# 字段类型：全是整数时记为 int，读取时还原为整数；否则必须全是字符串
+def _column_kind(field, values):
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "int"
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    raise ValueError(f"字段 {field} 同时包含数字和文本，无法编译")
+
+
+# 把 JSON 格式的单词列表编译为内存映射格式，先写临时文件再原子替换
+def compile_vocabulary(words, out_path, source=None):
+    out_path = Path(out_path)
+    words = list(words)
+    for word in words:
+        extra = set(word) - set(FIELDS)
+        if extra:
+            raise ValueError(f"不支持的字段: {', '.join(sorted(extra))}")
+
+    strings = []
+    string_ids = {}
+
+    def intern(value):
+        if value is None:
+            return MISSING
+        value = str(value)
+        index = string_ids.get(value)
+        if index is None:
+            index = string_ids[value] = len(strings)
+            strings.append(value)
+        return index
+
+    columns = {}
+    kinds = {}
+    for field in FIELDS:
+        values = [word.get(field) for word in words]
+        kinds[field] = _column_kind(field, values)
+        columns[field] = [intern(value) for value in values]
+
+    # 与 Vocabulary 一致：按 str(id) 查找，重复 id 时后出现的单词优先（稳定排序后取最后一个）
+    id_order = sorted(range(len(words)), key=lambda pos: str(words[pos].get("id")))
+
+    groups = {}
+    group_positions = []
+    for field in GROUP_FIELDS:
+        members = {}
+        for pos, word in enumerate(words):
+            value = word.get(field)
+            members.setdefault("" if value is None else str(value), []).append(pos)
+        entries = []
+        for key in sorted(members):
+            start = len(group_positions)
+            group_positions.extend(members[key])
+            entries.append([key, start, len(group_positions)])
+        groups[field] = entries
+
+    pool = bytearray()
+    offsets = [0]
+    for value in strings:
+        pool += value.encode("utf-8")
+        offsets.append(len(pool))
+    if len(pool) >= MISSING:
+        raise ValueError("字符串池超过 4GB，无法编译")
+
+    sections = [("str_offsets", _uint32_array(offsets)), ("str_pool", bytes(pool))]
+    sections += [(f"col_{field}", _uint32_array(columns[field])) for field in FIELDS]
+    sections += [("id_order", _uint32_array(id_order)), ("group_positions", _uint32_array(group_positions))]
+
+    # 各段位置依赖元数据长度，元数据又包含各段位置：逐步放大预留长度直到放得下
+    layout = []
+    position = 0
+    for name, data in sections:
+        position += -position % ALIGNMENT
+        layout.append((name, position, len(data)))
+        position += len(data)
+    meta = {
+        "count": len(words),
+        "strings": len(strings),
+        "kinds": kinds,
+        "groups": groups,
+        "source": source,
+    }
+    reserved = 0
+    while True:
+        base = HEADER.size + reserved
+        base += -base % ALIGNMENT
+        meta["sections"] = {name: [base + offset, length] for name, offset, length in layout}
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        if HEADER.size + len(meta_bytes) <= base:
+            break
+        reserved = len(meta_bytes)
+    meta_bytes += b" " * (base - HEADER.size - len(meta_bytes))
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = out_path.with_name(f".{out_path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(meta_bytes)))
+            f.write(meta_bytes)
+            for name, data in sections:
+                f.seek(meta["sections"][name][0])
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, out_path)
+    finally:
+        if tmp_file.exists():
+            tmp_file.unlink()
+    return out_path
+
+
+# 从 JSON 词库文件编译
+def compile_json_file(json_path, out_path=None):
+    json_path = Path(json_path)
+    out_path = Path(out_path) if out_path else json_path.with_suffix(".vocab")
+    with open(json_path, "r", encoding="utf-8") as f:
+        words = json.load(f)
+    return compile_vocabulary(words, out_path, source=json_path.name)
+
+
+# 单个单词的只读记录，按需从映射的文件中解码字段，接口与 dict 相同
+class WordRecord(Mapping):
+    __slots__ = ("_words", "_pos")
+
+    def __init__(self, words, pos):
+        self._words = words
+        self._pos = pos
+
+    def __getitem__(self, field):
+        return self._words.value(self._pos, field)
+
+    def __iter__(self):
+        return (field for field in FIELDS if self._words.has(self._pos, field))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+# 映射文件中的单词序列，按位置返回 WordRecord
+class CompiledWords(Sequence):
+    def __init__(self, buffer, meta):
+        self.buffer = buffer
+        self.meta = meta
+        self.count = meta["count"]
+        self.kinds = meta["kinds"]
+        self.offsets = self._uint32_section("str_offsets")
+        start, length = meta["sections"]["str_pool"]
+        self.pool = buffer[start:start + length]
+        self.columns = {field: self._uint32_section(f"col_{field}") for field in FIELDS}
+        self.id_order = self._uint32_section("id_order")
+        self.group_positions = self._uint32_section("group_positions")
+
+    def _uint32_section(self, name):
+        start, length = self.meta["sections"][name]
+        view = self.buffer[start:start + length]
+        if sys.byteorder == "little":
+            return view.cast("I")
+        # 大端机器上复制一份并转换字节序
+        data = array.array("I", bytes(view))
+        data.byteswap()
+        return data
+
+    def string(self, index):
+        return str(self.pool[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def has(self, pos, field):
+        column = self.columns.get(field)
+        return column is not None and column[pos] != MISSING
+
+    def value(self, pos, field):
+        column = self.columns.get(field)
+        if column is None or column[pos] == MISSING:
+            raise KeyError(field)
+        value = self.string(column[pos])
+        return int(value) if self.kinds[field] == "int" else value
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [WordRecord(self, i) for i in range(*pos.indices(self.count))]
+        if pos < 0:
+            pos += self.count
+        if not 0 <= pos < self.count:
+            raise IndexError("word position out of range")
+        return WordRecord(self, pos)
+
+    def __iter__(self):
+        return (WordRecord(self, pos) for pos in range(self.count))
+
+
+# id -> 位置的只读映射，在 id_order 上二分查找，不在内存中建字典
+class _IdIndex:
+    def __init__(self, words):
+        self.words = words
+        column = words.columns["id"]
+        self.keys = _SortedIds(words, column)
+
+    def get(self, word_id, default=None):
+        word_id = str(word_id)
+        # 取最后一个相同 id，与 dict 覆盖语义一致
+        index = bisect.bisect_right(self.keys, word_id) - 1
+        if index >= 0 and self.keys[index] == word_id:
+            return self.words.id_order[index]
+        return default
+
+    def __contains__(self, word_id):
+        return self.get(word_id) is not None
+
+    def __len__(self):
+        return len(self.words)
+
+
+# 按 id_order 顺序访问 id 字符串，供 bisect 使用
+class _SortedIds(Sequence):
+    def __init__(self, words, column):
+        self.words = words
+        self.column = column
+
+    def __len__(self):
+        return len(self.words.id_order)
+
+    def __getitem__(self, index):
+        string_index = self.column[self.words.id_order[index]]
+        return "None" if string_index == MISSING else self.words.string(string_index)
+
+
+# 从编译文件加载的词库，接口与 Vocabulary 相同；单元、词性索引直接引用映射中的位置数组
+class CompiledVocabulary(Vocabulary):
+    def __init__(self, path, mtime=None):
+        path = Path(path)
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(mapped)
+        magic, version, meta_length = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} 不是编译后的词库文件")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} 的格式版本 {version} 不受支持，请重新编译")
+        meta = json.loads(bytes(buffer[HEADER.size:HEADER.size + meta_length]))
+
+        self.words = CompiledWords(buffer, meta)
+        self.source = str(path.resolve())
+        self.mtime = mtime
+
+        positions = self.words.group_positions
+        self._init_indexes(
+            _IdIndex(self.words),
+            {key: positions[start:end] for key, start, end in meta["groups"]["unit"]},
+            {key: positions[start:end] for key, start, end in meta["groups"]["type"]},
+        )
+
+
+if __name__ == "__main__":
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("main.json")
+    target = compile_json_file(source, sys.argv[2] if len(sys.argv) > 2 else None)
+    vocab = CompiledVocabulary(target)
+    print(f"已编译 {len(vocab)} 个单词: {source} -> {target}")
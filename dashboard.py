@@ -0,0 +1,229 @@
+import heapq
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.context import SpawnContext, SpawnProcess
+
+from progress_store import get_progress_backend
+
+# 班级统计：汇总所有学习者的进度
+# 每次刷新只读取修订号（SQLite）或修改时间（JSON 文件）有变化的用户，变化多时分批交给进程池读取
+# 需要重新读取的用户超过这个数量时才使用进程池：当前进程读取一个用户约 0.2 ms，
+# 启动一个工作进程（导入 numpy 等）约 0.25 s，用户少时进程池反而更慢
+PARALLEL_THRESHOLD = 1000
+MIN_ATTEMPTS = 5  # 最难单词至少需要的答题次数
+
+
+# 单个用户进度的摘要：已掌握的单词、每个练习过的单词的 (正确, 错误) 次数，以及该用户的正确/错误总数
+def summarize_progress(data):
+    stats = {}
+    for word_id, record in data.get("word_stats", {}).items():
+        correct = record.get("correct", 0)
+        wrong = record.get("wrong", 0)
+        if correct + wrong > 0:
+            stats[str(word_id)] = (correct, wrong)
+    known = frozenset(str(word_id) for word_id, is_known in data.get("known_words", {}).items() if is_known)
+    return {
+        "known": known,
+        "stats": stats,
+        "correct": sum(correct for correct, _ in stats.values()),
+        "wrong": sum(wrong for _, wrong in stats.values()),
+    }
+
+
+# 进程池中执行：读取一批用户的进度并生成摘要
+def summarize_users(user_dir, kind, user_ids):
+    backend = get_progress_backend(user_dir, kind)
+    return [(user_id, summarize_progress(backend.load(user_id))) for user_id in user_ids]
+
+
+_start_lock = threading.Lock()
+
+
+# spawn 启动的工作进程默认会重新执行主模块；在 Streamlit 中主模块就是应用脚本，
+# 每个工作进程都要导入 streamlit 并执行页面初始化。启动时暂时换成空的主模块，工作进程只导入本模块
+class _WorkerProcess(SpawnProcess):
+    def start(self):
+        with _start_lock:
+            main_module = sys.modules["__main__"]
+            sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                super().start()
+            finally:
+                sys.modules["__main__"] = main_module
+
+
+class _WorkerContext(SpawnContext):
+    Process = _WorkerProcess
+
+
+# 增量维护的班级汇总：按单词累计正确/错误次数、练习人数和掌握人数
+class ClassRollup:
+    def __init__(self, user_dir, kind, max_workers=None):
+        self.user_dir = str(user_dir)
+        self.kind = kind
+        self.backend = get_progress_backend(user_dir, kind)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None
+        self.refresh_lock = threading.Lock()
+        self.data_lock = threading.Lock()
+        self.tokens = {}
+        self.summaries = {}
+        # 单词 id -> [正确次数, 错误次数, 练习人数, 掌握人数]
+        self.word_totals = {}
+        # 全班的正确次数、错误次数和掌握单词数之和
+        self.class_totals = {"correct": 0, "wrong": 0, "mastered": 0}
+        self.last_refresh = None
+
+    def _get_executor(self):
+        if self.executor is None:
+            # spawn 启动，工作进程不继承 Streamlit 的线程和锁，也不重新执行应用脚本
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_WorkerContext())
+        return self.executor
+
+    def _summarize(self, user_ids):
+        if len(user_ids) < PARALLEL_THRESHOLD or self.max_workers <= 1:
+            return summarize_users(self.user_dir, self.kind, user_ids)
+        chunk = max(1, -(-len(user_ids) // (self.max_workers * 4)))
+        try:
+            executor = self._get_executor()
+            futures = [executor.submit(summarize_users, self.user_dir, self.kind, user_ids[i:i + chunk])
+                       for i in range(0, len(user_ids), chunk)]
+            results = []
+            for future in futures:
+                results.extend(future.result())
+            return results
+        except BrokenProcessPool:
+            # 工作进程异常退出时丢弃进程池，本次在当前进程中读取
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            return summarize_users(self.user_dir, self.kind, user_ids)
+
+    # 用新的摘要替换某个用户的旧摘要（summary 为 None 表示用户已删除），调用方需持有 data_lock
+    def _apply(self, user_id, summary):
+        totals = self.word_totals
+        class_totals = self.class_totals
+        old = self.summaries.pop(user_id, None)
+        for sign, item in ((-1, old), (1, summary)):
+            if item is None:
+                continue
+            class_totals["correct"] += sign * item["correct"]
+            class_totals["wrong"] += sign * item["wrong"]
+            class_totals["mastered"] += sign * len(item["known"])
+            for word_id, (correct, wrong) in item["stats"].items():
+                entry = totals.setdefault(word_id, [0, 0, 0, 0])
+                entry[0] += sign * correct
+                entry[1] += sign * wrong
+                entry[2] += sign
+            for word_id in item["known"]:
+                entry = totals.setdefault(word_id, [0, 0, 0, 0])
+                entry[3] += sign
+        if old is not None:
+            for word_id in set(old["stats"]) | old["known"]:
+                if not any(totals.get(word_id, (1,))):
+                    totals.pop(word_id, None)
+        if summary is not None:
+            self.summaries[user_id] = summary
+
+    # 重新读取有变化的用户；已有其他会话在刷新时 blocking=False 直接返回 False，使用上一次的结果
+    def refresh(self, blocking=True):
+        if not self.refresh_lock.acquire(blocking=blocking):
+            return False
+        try:
+            started = time.perf_counter()
+            # 先读修订号再读数据，读到的数据不会比记录的修订号旧
+            tokens = self.backend.revisions()
+            changed = [user_id for user_id, token in tokens.items() if self.tokens.get(user_id) != token]
+            removed = [user_id for user_id in self.tokens if user_id not in tokens]
+            results = self._summarize(changed) if changed else []
+            with self.data_lock:
+                for user_id in removed:
+                    self._apply(user_id, None)
+                    del self.tokens[user_id]
+                for user_id, summary in results:
+                    self._apply(user_id, summary)
+                    self.tokens[user_id] = tokens[user_id]
+            self.last_refresh = {
+                "at": time.time(),
+                "seconds": time.perf_counter() - started,
+                "changed": len(changed),
+                "removed": len(removed),
+                "learners": len(tokens),
+            }
+            return True
+        finally:
+            self.refresh_lock.release()
+
+    # 班级总体情况
+    def overview(self):
+        with self.data_lock:
+            learners = len(self.summaries)
+            correct = self.class_totals["correct"]
+            wrong = self.class_totals["wrong"]
+            mastered = self.class_totals["mastered"]
+        return {
+            "learners": learners,
+            "average_mastered": mastered / learners if learners else 0.0,
+            "answers": correct + wrong,
+            "accuracy": correct / (correct + wrong) if correct + wrong else None,
+        }
+
+    # 每个学习者一行：已掌握、已练习、正确率
+    def learners(self):
+        with self.data_lock:
+            items = list(self.summaries.items())
+        rows = []
+        for user_id, summary in items:
+            correct = summary["correct"]
+            wrong = summary["wrong"]
+            rows.append({
+                "learner": user_id,
+                "mastered": len(summary["known"]),
+                "practised": len(summary["stats"]),
+                "accuracy": round(correct / (correct + wrong), 3) if correct + wrong else None,
+            })
+        rows.sort(key=lambda row: (-row["mastered"], row["learner"]))
+        return rows
+
+    # 全班错误率最高的单词（答题次数不少于 min_attempts），O(n log k)
+    def hardest_words(self, count=10, min_attempts=MIN_ATTEMPTS):
+        with self.data_lock:
+            candidates = [(word_id, entry[:]) for word_id, entry in self.word_totals.items()
+                          if entry[0] + entry[1] >= min_attempts]
+        top = heapq.nlargest(count, candidates,
+                             key=lambda item: (item[1][1] / (item[1][0] + item[1][1]), item[1][1]))
+        return [(word_id, correct, wrong, learners, mastered)
+                for word_id, (correct, wrong, learners, mastered) in top]
+
+    # 按单元汇总：单元 -> 正确次数、错误次数、掌握人次；unit_of(单词 id) 返回单词所在单元（不在词库中的单词返回 None，忽略）
+    def unit_rollup(self, unit_of):
+        with self.data_lock:
+            items = [(word_id, entry[:]) for word_id, entry in self.word_totals.items()]
+        units = {}
+        for word_id, (correct, wrong, learners, mastered) in items:
+            unit = unit_of(word_id)
+            if unit is None:
+                continue
+            row = units.setdefault(str(unit), [0, 0, 0])
+            row[0] += correct
+            row[1] += wrong
+            row[2] += mastered
+        return units
+
+
+_rollups = {}
+_rollups_lock = threading.Lock()
+
+
+# 获取进程级共享的班级汇总
+def get_class_rollup(user_dir, kind="sqlite"):
+    key = (os.path.abspath(str(user_dir)), kind)
+    with _rollups_lock:
+        rollup = _rollups.get(key)
+        if rollup is None:
+            rollup = _rollups[key] = ClassRollup(user_dir, kind)
+    return rollup
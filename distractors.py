@@ -0,0 +1,88 @@
+import random
+
+
+# 一组去重后的释义（保存释义编号），附带编号 -> 组内位置的映射，用于排除已选项
+class _MeaningPool:
+    def __init__(self):
+        self.meanings = []
+        self.positions = {}
+
+    def add(self, meaning):
+        if meaning not in self.positions:
+            self.positions[meaning] = len(self.meanings)
+            self.meanings.append(meaning)
+
+    # 不放回地抽取最多 k 个不在 excluded 中的释义，不需要拒绝重试
+    def sample(self, k, excluded, rng):
+        skip = sorted(self.positions[m] for m in excluded if m in self.positions)
+        available = len(self.meanings) - len(skip)
+        k = min(k, available)
+        if k <= 0:
+            return []
+        picks = []
+        # 在去掉排除项后的区间里抽样，再按升序逐个跳过排除位置映射回原位置
+        for pos in rng.sample(range(available), k):
+            for skipped in skip:
+                if pos >= skipped:
+                    pos += 1
+                else:
+                    break
+            picks.append(self.meanings[pos])
+        return picks
+
+
+# 选择题干扰项索引：释义去重后按 (词性, 单元)、词性、全部 三级分组
+class DistractorIndex:
+    def __init__(self, words):
+        self.words = words
+        self.meanings = []
+        meaning_ids = {}
+        self.by_type_unit = {}
+        self.by_type = {}
+        self.all = _MeaningPool()
+
+        for word in words:
+            zh = word["zh"]
+            meaning = meaning_ids.get(zh)
+            if meaning is None:
+                meaning = len(self.meanings)
+                meaning_ids[zh] = meaning
+                self.meanings.append(zh)
+            word_type = word.get("type", "")
+            unit = str(word.get("unit", ""))
+            self.by_type_unit.setdefault((word_type, unit), _MeaningPool()).add(meaning)
+            self.by_type.setdefault(word_type, _MeaningPool()).add(meaning)
+            self.all.add(meaning)
+
+        self.meaning_ids = meaning_ids
+
+    # 生成一道题的选项：优先同词性同单元的释义，不够时逐级放宽
+    def options_for(self, word, count=4, rng=random):
+        answer = word["zh"]
+        answer_meaning = self.meaning_ids.get(answer)
+        excluded = [answer_meaning] if answer_meaning is not None else []
+        word_type = word.get("type", "")
+        pools = (
+            self.by_type_unit.get((word_type, str(word.get("unit", "")))),
+            self.by_type.get(word_type),
+            self.all,
+        )
+
+        picked = []
+        for pool in pools:
+            need = count - 1 - len(picked)
+            if need <= 0:
+                break
+            if pool is None:
+                continue
+            chosen = pool.sample(need, excluded, rng)
+            picked.extend(chosen)
+            excluded.extend(chosen)
+
+        options = [answer] + [self.meanings[m] for m in picked]
+        rng.shuffle(options)
+        return options, answer
+
+    # 批量生成一整轮题目的选项
+    def build_round(self, words, count=4, rng=random):
+        return [self.options_for(word, count, rng) for word in words]
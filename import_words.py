@@ -0,0 +1,415 @@
+# 从外部单词表批量导入单词（CSV / TSV / Anki 导出的纯文本笔记）
+#
+#   python import_words.py words.csv                            # 追加到 main.json
+#   python import_words.py anki.txt --columns en,zh,-,unit
+#   python import_words.py words.tsv books/main --unit 12       # 追加到词书的各单元分片
+#
+# 输入逐行读取，新单词边读边写入，不整体载入内存；已有单词（按英文拼写，不区分大小写）和文件内重复的行跳过；
+# 去重用内存中的拼写集合，包含已有单词和已导入的新单词，内存占用随导入的单词数增长（20 万个新单词约 20 MB）；
+# 新单词的 id 接在已有最大 id 之后，重复导入同一文件不会改变已有单词的 id；
+# 新单词直接追加写入临时文件再原子替换，已有编译版本（.vocab）的文件同时重新编译
+import argparse
+import csv
+import html
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from compiled_vocab import compile_json_file
+from library import CATALOG_NAME, ID_INDEX_NAME, SHARD_DIR, Book, _write_json
+from word_store import COMPILED_SUFFIX, read_vocabulary, vocabulary_file
+
+DEFAULT_UNIT = "导入"  # 没有单元列时使用的单元
+PROGRESS_INTERVAL = 50000  # 每读取多少行输出一次进度
+
+# 表头名称 -> 字段
+COLUMN_ALIASES = {
+    "en": ("en", "english", "word", "front", "单词", "英文"),
+    "zh": ("zh", "chinese", "meaning", "definition", "translation", "back", "释义", "中文", "词义"),
+    "type": ("type", "pos", "part of speech", "词性"),
+    "unit": ("unit", "lesson", "chapter", "单元", "课"),
+}
+DEFAULT_COLUMNS = ("en", "zh", "type", "unit")
+
+# 词性写法统一为 main.json 中的缩写形式，例如 "Noun" -> "n."、"vt.&ⅵ." -> "vt. & vi."
+TYPE_ALIASES = {
+    "noun": "n", "verb": "v", "adjective": "adj", "adverb": "adv", "preposition": "prep",
+    "conjunction": "conj", "pronoun": "pron", "numeral": "num", "article": "art",
+    "interjection": "int", "interj": "int", "abbreviation": "abbr", "phr": "phrase",
+}
+TYPE_ABBREVIATIONS = {"n", "v", "vt", "vi", "adj", "adv", "prep", "conj", "pron", "num", "art", "int", "abbr", "aux"}
+ANKI_SEPARATORS = {"tab": "\t", "comma": ",", "semicolon": ";", "pipe": "|", "space": " ", "colon": ":"}
+
+
+def normalize_type(value):
+    # NFKC 会把罗马数字 "ⅵ"、全角字母等还原为普通字母
+    value = unicodedata.normalize("NFKC", value or "").strip().lower()
+    parts = []
+    for part in re.split(r"\s*(?:&|/|,|;|，|；)\s*", value):
+        part = part.strip().rstrip(".").strip()
+        if not part:
+            continue
+        part = TYPE_ALIASES.get(part, part)
+        parts.append(f"{part}." if part in TYPE_ABBREVIATIONS else part)
+    return " & ".join(parts)
+
+
+# "Unit 3"、"U03"、"第3单元"、"3.0" 统一为 "3"，其他写法去掉首尾空白后原样保留
+def normalize_unit(value, default=DEFAULT_UNIT):
+    value = unicodedata.normalize("NFKC", value or "").strip()
+    if not value:
+        return default
+    match = re.fullmatch(r"(?:unit|lesson|u|第)?\s*0*(\d+)(?:\.0+)?\s*(?:单元|课)?", value, re.IGNORECASE)
+    if match:
+        return match.group(1) or "0"
+    return value
+
+
+# 去重用的键：合并空白、不区分大小写
+def word_key(en):
+    return " ".join(str(en).split()).casefold()
+
+
+def _clean(value, is_html):
+    value = value or ""
+    if is_html:
+        value = re.sub(r"<br\s*/?>", " ", value, flags=re.IGNORECASE)
+        value = html.unescape(re.sub(r"<[^>]+>", "", value))
+    return " ".join(value.split())
+
+
+# 逐行读取外部单词表，产出 {"en", "zh", "type", "unit"}（缺少的字段为空字符串）
+# Anki 导出文件开头的 #separator / #html / #columns 说明行会被识别
+def read_rows(path, delimiter=None, columns=None, is_html=None):
+    path = Path(path)
+    if delimiter is None:
+        delimiter = "," if path.suffix.lower() == ".csv" else "\t"
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        header_columns = None
+        line = f.readline()
+        # 说明行只出现在文件开头
+        while line.startswith("#") and ":" in line:
+            name, _, value = line[1:].rstrip("\r\n").partition(":")
+            name = name.strip().lower()
+            if name == "separator":
+                delimiter = ANKI_SEPARATORS.get(value.strip().lower(), value)
+            elif name == "html" and is_html is None:
+                is_html = value.strip().lower() == "true"
+            elif name == "columns":
+                header_columns = value
+            line = f.readline()
+
+        reader = csv.reader(_prepend(line, f), delimiter=delimiter)
+        if header_columns is not None:
+            header_columns = next(csv.reader([header_columns], delimiter=delimiter))
+        mapping = _column_mapping(columns, header_columns)
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            if mapping is None:
+                # 没有指定列时，第一行像表头就按表头对应，否则按 en, zh, type, unit 的顺序
+                mapping = _column_mapping(None, row)
+                if mapping is not None:
+                    continue
+                mapping = list(DEFAULT_COLUMNS)
+            record = {field: "" for field in DEFAULT_COLUMNS}
+            for field, cell in zip(mapping, row):
+                if field in record:
+                    record[field] = _clean(cell, is_html)
+            yield record
+
+
+def _prepend(first_line, lines):
+    if first_line:
+        yield first_line
+    yield from lines
+
+
+# 返回每一列对应的字段（None 表示忽略该列）；无法从表头识别时返回 None
+def _column_mapping(columns, header):
+    if columns:
+        return [field if field in DEFAULT_COLUMNS else None for field in columns]
+    if not header:
+        return None
+    mapping = []
+    for cell in header:
+        name = cell.strip().lower()
+        mapping.append(next((field for field, aliases in COLUMN_ALIASES.items() if name in aliases), None))
+    return mapping if "en" in mapping else None
+
+
+# 追加写入 JSON 数组：复制原文件并去掉末尾的 "]"，逐条写入新单词后原子替换
+class JsonArrayAppender:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_file = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.tmp")
+        self.file = open(self.tmp_file, "w+b")
+        self.count = 0
+        self.empty = True
+        if self.path.exists():
+            with open(self.path, "rb") as source:
+                while True:
+                    chunk = source.read(1 << 20)
+                    if not chunk:
+                        break
+                    self.file.write(chunk)
+            self._strip_closing()
+        if self.file.tell() == 0:
+            self.file.write(b"[")
+
+    # 去掉数组末尾的 "]"（以及之前的空白），同时判断数组是否为空
+    def _strip_closing(self):
+        closing = self._last_byte(self.file.seek(0, os.SEEK_END))
+        if closing is None:
+            self.file.truncate(0)
+            self.file.seek(0)
+            return
+        self.file.seek(closing)
+        last = self._last_byte(closing)
+        if self.file.read(1) != b"]" or last is None:
+            raise ValueError(f"{self.path} 不是 JSON 数组")
+        self.file.seek(last)
+        self.empty = self.file.read(1) == b"["
+        self.file.truncate(last + 1)
+        self.file.seek(0, os.SEEK_END)
+
+    # end 之前最后一个非空白字节的位置，全是空白时返回 None
+    def _last_byte(self, end):
+        while end > 0:
+            start = max(0, end - 4096)
+            self.file.seek(start)
+            chunk = self.file.read(end - start).rstrip()
+            if chunk:
+                return start + len(chunk) - 1
+            end = start
+        return None
+
+    def append(self, word):
+        line = json.dumps(word, ensure_ascii=False, separators=(",", ":"))
+        self.file.write((("\n  " if self.empty else ",\n  ") + line).encode("utf-8"))
+        self.empty = False
+        self.count += 1
+
+    def commit(self):
+        self.file.write(b"\n]\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.tmp_file, self.path)
+
+    def abort(self):
+        self.file.close()
+        if self.tmp_file.exists():
+            self.tmp_file.unlink()
+
+
+# 去重索引（已有单词和本次新增单词的拼写）、下一个 id 和已有的词性写法
+class WordIndex:
+    def __init__(self, id_prefix=None):
+        self.keys = set()
+        self.id_prefix = id_prefix
+        self.numeric_ids = True
+        self.next_number = 1
+        self.type_counts = Counter()
+        self.type_map = None
+
+    def add_existing(self, word):
+        self.keys.add(word_key(word["en"]))
+        self.type_counts[word.get("type", "")] += 1
+        word_id = word.get("id")
+        if not isinstance(word_id, int):
+            self.numeric_ids = False
+            if self.id_prefix is None:
+                # 带前缀的 id（例如按词书加了前缀）沿用第一个单词的前缀
+                self.id_prefix = re.sub(r"\d+$", "", str(word_id))
+        match = re.search(r"(\d+)$", str(word_id))
+        if match:
+            self.next_number = max(self.next_number, int(match.group(1)) + 1)
+
+    # 词性统一为词库中已有的写法（例如已有 "ⅵ." 时导入的 "vi." 不会成为新的词性），
+    # 同一种词性有多种写法时使用单词最多的一种，词库中没有的词性使用 normalize_type 的结果
+    def canonical_type(self, value):
+        if self.type_map is None:
+            self.type_map = {}
+            for spelling, count in self.type_counts.most_common():
+                self.type_map.setdefault(normalize_type(spelling), spelling)
+        key = normalize_type(value)
+        return self.type_map.setdefault(key, key)
+
+    # 未出现过的单词返回新 id，重复的返回 None
+    def claim(self, en):
+        key = word_key(en)
+        if key in self.keys:
+            return None
+        self.keys.add(key)
+        number = self.next_number
+        self.next_number += 1
+        if self.id_prefix or not self.numeric_ids:
+            return f"{self.id_prefix or ''}{number}"
+        return number
+
+
+# 读取输入并产出待写入的新单词，同时统计跳过的行
+def new_words(rows, index, default_unit, counts):
+    started = time.perf_counter()
+    for record in rows:
+        counts["rows"] += 1
+        if counts["rows"] % PROGRESS_INTERVAL == 0:
+            print(f"\r已读取 {counts['rows']} 行，{counts['rows'] / (time.perf_counter() - started):.0f} 行/秒",
+                  end="", file=sys.stderr)
+        if not record["en"] or not record["zh"]:
+            counts["invalid"] += 1
+            continue
+        word_id = index.claim(record["en"])
+        if word_id is None:
+            counts["duplicate"] += 1
+            continue
+        counts["added"] += 1
+        yield {
+            "en": record["en"],
+            "zh": record["zh"],
+            "unit": normalize_unit(record["unit"], default_unit),
+            "type": index.canonical_type(record["type"]),
+            "id": word_id,
+        }
+    if counts["rows"] >= PROGRESS_INTERVAL:
+        print(file=sys.stderr)
+
+
+# 导入到单个 JSON 词库文件（例如 main.json）
+def import_into_file(rows, target, default_unit=DEFAULT_UNIT, id_prefix=None, compile_index=False):
+    target = Path(target)
+    index = WordIndex(id_prefix)
+    if target.exists():
+        for word in read_vocabulary(vocabulary_file(target)):
+            index.add_existing(word)
+
+    counts = Counter()
+    appender = JsonArrayAppender(target)
+    try:
+        for word in new_words(rows, index, default_unit, counts):
+            appender.append(word)
+        if not appender.count:
+            appender.abort()
+            return counts
+        appender.commit()
+    except BaseException:
+        appender.abort()
+        raise
+    if compile_index or target.with_suffix(COMPILED_SUFFIX).exists():
+        compile_json_file(target)
+    return counts
+
+
+# 导入到按单元分片的词书目录：新单词按单元追加到对应分片，最后更新目录
+def import_into_book(rows, book_dir, default_unit=DEFAULT_UNIT, id_prefix=None, compile_index=False, title=None):
+    book_dir = Path(book_dir)
+    catalog_file = book_dir / CATALOG_NAME
+    book = Book(book_dir.name, catalog_file, None) if catalog_file.exists() else None
+    index = WordIndex(id_prefix)
+    entries = {}
+    if book is not None:
+        for unit in book.units:
+            ids = []
+            for word in read_vocabulary(vocabulary_file(book.shard_file(unit))):
+                index.add_existing(word)
+                ids.append(str(word["id"]))
+            entries[unit] = dict(book.entries[unit], types=Counter(book.entries[unit]["types"]), ids=ids)
+
+    counts = Counter()
+    appenders = {}
+    used_files = {entry["file"] for entry in entries.values()}
+    try:
+        for word in new_words(rows, index, default_unit, counts):
+            unit = word["unit"]
+            appender = appenders.get(unit)
+            if appender is None:
+                entry = entries.get(unit)
+                if entry is None:
+                    file_index = len(used_files)
+                    while f"{SHARD_DIR}/unit_{file_index:04d}.json" in used_files:
+                        file_index += 1
+                    file_name = f"{SHARD_DIR}/unit_{file_index:04d}.json"
+                    used_files.add(file_name)
+                    entry = entries[unit] = {"unit": unit, "file": file_name, "count": 0, "types": Counter(), "ids": []}
+                appender = appenders[unit] = JsonArrayAppender(book_dir / entry["file"])
+            appender.append(word)
+            entries[unit]["count"] += 1
+            entries[unit]["types"][word["type"]] += 1
+            entries[unit]["ids"].append(str(word["id"]))
+        # 先替换分片，最后写目录；读取方按目录加载，不会看到不完整的词书
+        for unit, appender in appenders.items():
+            appender.commit()
+    except BaseException:
+        for appender in appenders.values():
+            appender.abort()
+        raise
+
+    for unit in appenders:
+        shard_file = book_dir / entries[unit]["file"]
+        if compile_index or shard_file.with_suffix(COMPILED_SUFFIX).exists():
+            compile_json_file(shard_file)
+
+    if appenders or book is None:
+        units = []
+        ids_by_unit = {}
+        all_types = set()
+        for unit in sorted(entries):
+            entry = dict(entries[unit], types=dict(sorted(entries[unit]["types"].items())))
+            ids_by_unit[unit] = entry.pop("ids")
+            all_types.update(entry["types"])
+            units.append(entry)
+        _write_json(book_dir / ID_INDEX_NAME, ids_by_unit)
+        _write_json(catalog_file, {
+            "title": title or (book.title if book is not None else book_dir.name),
+            "count": sum(entry["count"] for entry in units),
+            "types": sorted(all_types),
+            "units": units,
+            "id_index": ID_INDEX_NAME,
+        })
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从 CSV / TSV / Anki 导出文件批量导入单词")
+    parser.add_argument("source", help="要导入的单词表文件")
+    parser.add_argument("target", nargs="?", default="main.json", help="JSON 词库文件或词书目录（默认 main.json）")
+    parser.add_argument("--columns", help="各列对应的字段，逗号分隔，用 - 跳过一列，例如 en,zh,-,unit（默认按表头识别）")
+    parser.add_argument("--delimiter", help="分隔符（默认 .csv 为逗号，其他为制表符）")
+    parser.add_argument("--html", action="store_true", default=None, help="字段包含 HTML，导入时去掉标签")
+    parser.add_argument("--unit", default=DEFAULT_UNIT, help=f"没有单元列时使用的单元（默认 {DEFAULT_UNIT}）")
+    parser.add_argument("--id-prefix", help="新单词 id 的前缀（默认与已有单词一致）")
+    parser.add_argument("--title", help="新建词书时的标题")
+    parser.add_argument("--compile", action="store_true", help="同时生成内存映射格式（.vocab）")
+    args = parser.parse_args(argv)
+
+    columns = [name.strip() for name in args.columns.split(",")] if args.columns else None
+    if columns:
+        for name in columns:
+            if name not in DEFAULT_COLUMNS and name != "-":
+                parser.error(f"未知的字段: {name}")
+        if "en" not in columns or "zh" not in columns:
+            parser.error("--columns 必须包含 en 和 zh")
+    delimiter = args.delimiter.encode().decode("unicode_escape") if args.delimiter else None
+
+    started = time.perf_counter()
+    rows = read_rows(args.source, delimiter, columns, args.html)
+    target = Path(args.target)
+    if target.suffix.lower() == ".json":
+        counts = import_into_file(rows, target, args.unit, args.id_prefix, args.compile)
+    else:
+        counts = import_into_book(rows, target, args.unit, args.id_prefix, args.compile, args.title)
+    print(f"读取 {counts['rows']} 行: 新增 {counts['added']} 个单词，跳过已有 {counts['duplicate']} 个，"
+          f"无效 {counts['invalid']} 行，用时 {time.perf_counter() - started:.1f}s -> {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+import argparse
+import itertools
+import json
+import os
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from compiled_vocab import compile_vocabulary
+from word_store import Vocabulary, read_vocabulary, vocabulary_file
+
+# 词书目录结构（一个部署可以放多本词书）：
+#   books/<词书>/catalog.json        词书目录：标题、总数、每个单元的分片文件、单词数和词性分布
+#   books/<词书>/ids.json            每个单元的单词 id 列表，只在按 id 查找单词时读取
+#   books/<词书>/units/unit_0000.json 每个单元一个分片（可选同名 .vocab 编译版本）
+# 侧边栏只读取目录，选中单元后才加载对应分片；学习进度按单词 id 记录，各词书的 id 需要全局唯一
+CATALOG_NAME = "catalog.json"
+SHARD_DIR = "units"
+ID_INDEX_NAME = "ids.json"
+DEFAULT_CACHE_WORDS = 200000  # 分片缓存最多保留的单词数量
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, path)
+    finally:
+        if tmp_file.exists():
+            tmp_file.unlink()
+
+
+# 把单词列表按单元拆分成分片并生成目录；目录最后写入，读取方不会看到不完整的词书
+def shard_book(words, book_dir, title=None, id_prefix="", compile_shards=False):
+    book_dir = Path(book_dir)
+    by_unit = {}
+    seen = set()
+    for word in words:
+        word = dict(word)
+        if id_prefix:
+            word["id"] = f"{id_prefix}{word['id']}"
+        word_id = str(word["id"])
+        if word_id in seen:
+            raise ValueError(f"单词 id 重复: {word_id}")
+        seen.add(word_id)
+        by_unit.setdefault(str(word.get("unit", "")), []).append(word)
+
+    units = []
+    ids_by_unit = {}
+    all_types = Counter()
+    for index, unit in enumerate(sorted(by_unit)):
+        shard_words = by_unit[unit]
+        file_name = f"{SHARD_DIR}/unit_{index:04d}.json"
+        shard_file = book_dir / file_name
+        _write_json(shard_file, shard_words)
+        compiled_file = shard_file.with_suffix(".vocab")
+        if compile_shards:
+            compile_vocabulary(shard_words, compiled_file, source=shard_file.name)
+        elif compiled_file.exists():
+            compiled_file.unlink()
+        type_counts = Counter(word.get("type", "") for word in shard_words)
+        all_types.update(type_counts)
+        units.append({"unit": unit, "file": file_name, "count": len(shard_words),
+                      "types": dict(sorted(type_counts.items()))})
+        ids_by_unit[unit] = [str(word["id"]) for word in shard_words]
+
+    _write_json(book_dir / ID_INDEX_NAME, ids_by_unit)
+    catalog = {
+        "title": title or book_dir.name,
+        "count": len(seen),
+        "types": sorted(all_types),
+        "units": units,
+        "id_index": ID_INDEX_NAME,
+    }
+    _write_json(book_dir / CATALOG_NAME, catalog)
+
+    # 清理重新拆分后不再使用的旧分片
+    used = {book_dir / entry["file"] for entry in units}
+    for old_file in (book_dir / SHARD_DIR).glob("unit_*"):
+        if old_file.with_suffix(".json") not in used:
+            old_file.unlink()
+    return catalog
+
+
+# 一本词书的目录信息（不含单词数据）
+class Book:
+    def __init__(self, book_id, catalog_file, mtime):
+        with open(catalog_file, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+        self.id = book_id
+        self.root = Path(catalog_file).parent
+        self.mtime = mtime
+        self.title = catalog.get("title", book_id)
+        self.count = catalog["count"]
+        self.types = catalog["types"]
+        self.entries = {entry["unit"]: entry for entry in catalog["units"]}
+        self.units = [entry["unit"] for entry in catalog["units"]]
+        self.id_index = catalog.get("id_index")
+        self._word_units = None
+
+    def shard_file(self, unit):
+        return self.root / self.entries[unit]["file"]
+
+    # 单词 id -> 单元，第一次按 id 查找时由 id 列表文件生成；
+    # 旧版本词书没有 id 列表文件时用 load_shard 读取各分片生成
+    def word_units(self, load_shard):
+        if self._word_units is None:
+            if self.id_index:
+                with open(self.root / self.id_index, "r", encoding="utf-8") as f:
+                    ids_by_unit = json.load(f)
+            else:
+                ids_by_unit = {unit: [str(word["id"]) for word in load_shard(unit)] for unit in self.units}
+            self._word_units = {word_id: unit for unit, ids in ids_by_unit.items() for word_id in ids}
+        return self._word_units
+
+    # 按目录统计选中单元、词性的单词数，不加载分片
+    def count_words(self, units=None, types=None):
+        total = 0
+        for unit in (units or self.units):
+            entry = self.entries.get(str(unit))
+            if entry is None:
+                continue
+            if types:
+                total += sum(entry["types"].get(word_type, 0) for word_type in types)
+            else:
+                total += entry["count"]
+        return total
+
+
+# 词书目录列表，每次调用只检查各目录文件的修改时间
+class Library:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.lock = threading.Lock()
+        self.books = {}
+
+    def list_books(self):
+        if not self.root.is_dir():
+            return {}
+        with self.lock:
+            books = {}
+            for child in sorted(self.root.iterdir()):
+                catalog_file = child / CATALOG_NAME
+                try:
+                    mtime = catalog_file.stat().st_mtime_ns
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+                book = self.books.get(child.name)
+                if book is None or book.mtime != mtime:
+                    book = Book(child.name, catalog_file, mtime)
+                books[child.name] = book
+            self.books = books
+            return dict(books)
+
+
+# 进程级分片缓存：按最近使用淘汰，容量按单词数计算；多个单元的组合视图也缓存，保证同样的选择得到同一个对象
+class ShardCache:
+    def __init__(self, max_words=DEFAULT_CACHE_WORDS):
+        self.max_words = max_words
+        self.lock = threading.RLock()
+        self.entries = OrderedDict()
+        self.words = 0
+
+    def _get(self, key, loader):
+        with self.lock:
+            vocab = self.entries.get(key)
+            if vocab is not None:
+                self.entries.move_to_end(key)
+                return vocab
+            vocab = loader()
+            self.entries[key] = vocab
+            self.words += len(vocab)
+            # 至少保留刚加载的一项
+            while self.words > self.max_words and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.words -= len(evicted)
+            return vocab
+
+    def shard(self, book, unit):
+        data_file = vocabulary_file(book.shard_file(unit))
+        mtime = data_file.stat().st_mtime_ns
+        key = ("shard", str(data_file.resolve()), mtime)
+        return self._get(key, lambda: read_vocabulary(data_file, mtime))
+
+    # 选中单元的词库；没有选择单元时加载整本词书
+    def load_units(self, book, units=None):
+        selected = {str(unit) for unit in units or ()}
+        units = [unit for unit in book.units if unit in selected] or list(book.units)
+        if len(units) == 1:
+            return self.shard(book, units[0])
+        shards = [self.shard(book, unit) for unit in units]
+        key = ("view", str(book.root), tuple((shard.source, shard.mtime) for shard in shards))
+        return self._get(key, lambda: Vocabulary(itertools.chain.from_iterable(shards),
+                                                 source=str(book.root), mtime=book.mtime))
+
+    # 整本词书的单词 id -> 单元
+    def word_units(self, book):
+        return book.word_units(lambda unit: self.shard(book, unit))
+
+    # 按 id 在整本词书中查找单词（不限于当前选中的单元），只加载单词所在的分片
+    def get_word(self, book, word_id):
+        unit = self.word_units(book).get(str(word_id))
+        if unit is None:
+            return None
+        return self.shard(book, unit).get(word_id)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "words": self.words, "max_words": self.max_words}
+
+
+_libraries = {}
+_shard_cache = None
+_library_lock = threading.Lock()
+
+
+# 获取进程级共享的词书列表
+def get_library(root):
+    key = str(Path(root).resolve())
+    with _library_lock:
+        library = _libraries.get(key)
+        if library is None:
+            library = _libraries[key] = Library(root)
+    return library
+
+
+# 获取进程级共享的分片缓存
+def get_shard_cache(max_words=DEFAULT_CACHE_WORDS):
+    global _shard_cache
+    with _library_lock:
+        if _shard_cache is None:
+            _shard_cache = ShardCache(max_words)
+        else:
+            _shard_cache.max_words = max_words
+    return _shard_cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把 JSON 词库按单元拆分为词书分片")
+    parser.add_argument("source", help="JSON 词库文件，例如 main.json")
+    parser.add_argument("book_dir", help="输出的词书目录，例如 books/main")
+    parser.add_argument("--title", help="词书标题（默认使用目录名）")
+    parser.add_argument("--id-prefix", default="", help="给单词 id 加前缀，避免与其他词书冲突")
+    parser.add_argument("--compile", action="store_true", help="同时生成内存映射格式的分片")
+    args = parser.parse_args()
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        source_words = json.load(f)
+    result = shard_book(source_words, args.book_dir, args.title, args.id_prefix, args.compile)
+    print(f"已拆分 {result['count']} 个单词、{len(result['units'])} 个单元: {args.book_dir}")
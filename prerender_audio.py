@@ -0,0 +1,189 @@
+# 离线批量预生成单词发音，写入应用使用的音频缓存（audio/）
+#
+#   python prerender_audio.py                                  # main.json，女声，语速 150
+#   python prerender_audio.py main.json --units 1,2 --genders female,male --speeds 120,150,180
+#   python prerender_audio.py books/main --workers 4 --batch 64
+#
+# 每个工作进程各自持有一个 TTS 引擎，一批单词只调用一次 runAndWait；
+# 先合成标准语速，其他语速由标准语速的音频变速得到（与应用内的生成方式一致）；
+# 已存在的音频直接跳过，文件先写临时文件再原子改名，中断后重新运行即可从断点继续
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from audio_cache import AudioCache, audio_file_path, make_key, part_file_path
+from library import CATALOG_NAME, Book, ShardCache
+from speech import BASE_SPEED
+from word_store import read_vocabulary, vocabulary_file
+
+DEFAULT_BATCH = 32  # 每次 runAndWait 合成的单词数
+MANIFEST_SAVE_INTERVAL = 5.0  # 清单落盘间隔（秒）
+
+
+# 由已生成的标准语速音频变速得到指定语速，无法变速时返回 False
+def derive_file(audio_dir, text, gender, speed, part_file):
+    try:
+        from timestretch import stretch_wav
+        base = audio_file_path(audio_dir, make_key(text, gender, BASE_SPEED)).read_bytes()
+        part_file.write_bytes(stretch_wav(base, speed / BASE_SPEED))
+        return True
+    except (ImportError, OSError, ValueError, EOFError, wave.Error):
+        return False
+
+
+# 工作进程：生成一批单词，返回成功写入的 (键, 文本) 列表和失败信息
+def render_batch(audio_dir, gender, speed, items):
+    from speech import get_engine_manager
+
+    parts = [(key, text, part_file_path(audio_dir, key)) for key, text in items]
+    done = []
+    try:
+        to_synthesize = parts
+        if speed != BASE_SPEED:
+            to_synthesize = [part for part in parts if not derive_file(audio_dir, part[1], gender, speed, part[2])]
+        if to_synthesize:
+            get_engine_manager().synthesize(
+                [(text, part_file) for _, text, part_file in to_synthesize], gender, speed)
+        for key, text, part_file in parts:
+            # 个别条目可能没有生成文件，只登记完整写出的音频
+            if part_file.exists() and part_file.stat().st_size > 0:
+                os.replace(part_file, audio_file_path(audio_dir, key))
+                done.append((key, text))
+        error = None if len(done) == len(parts) else f"{len(parts) - len(done)} 个单词没有生成音频"
+    except Exception as e:
+        error = str(e)
+    finally:
+        for _, _, part_file in parts:
+            if part_file.exists():
+                try:
+                    part_file.unlink()
+                except OSError:
+                    pass
+    return done, error
+
+
+def _init_worker():
+    from speech import _init_worker as init_com
+    init_com()
+
+
+# 读取要生成的单词：JSON / 编译词库文件，或按单元分片的词书目录
+def load_words(source, units):
+    source = Path(source)
+    if (source / CATALOG_NAME).exists():
+        book = Book(source.name, source / CATALOG_NAME, None)
+        return list(ShardCache().load_units(book, units))
+    vocab = read_vocabulary(vocabulary_file(source))
+    return [vocab[pos] for pos in vocab.select(units)]
+
+
+# 按 (语音, 语速) 分组生成待合成的批次，拼写相同的单词只合成一次，已存在的文件跳过
+# 返回的批次按阶段排列：先是标准语速，之后是由它变速得到的其他语速
+def plan_batches(words, audio_dir, genders, speeds, batch_size):
+    batches = ([], [])
+    skipped = 0
+    for gender in genders:
+        for speed in speeds:
+            pending = {}
+            for word in words:
+                text = word["en"]
+                key = make_key(text, gender, speed)
+                if key in pending:
+                    continue
+                if audio_file_path(audio_dir, key).exists():
+                    skipped += 1
+                    continue
+                pending[key] = text
+            items = list(pending.items())
+            phase = batches[0] if speed == BASE_SPEED else batches[1]
+            for start in range(0, len(items), batch_size):
+                phase.append((gender, speed, items[start:start + batch_size]))
+    return batches, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线批量预生成单词发音")
+    parser.add_argument("source", nargs="?", default="main.json", help="词库文件或词书目录（默认 main.json）")
+    parser.add_argument("--units", default="", help="只生成这些单元，逗号分隔（默认全部）")
+    parser.add_argument("--genders", default="female", help="语音性别，逗号分隔: female,male")
+    parser.add_argument("--speeds", default="150", help="语速，逗号分隔，例如 120,150,180")
+    parser.add_argument("--audio-dir", default="audio", help="音频缓存目录（默认 audio）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数（默认 CPU 核数）")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="每次引擎运行合成的单词数")
+    args = parser.parse_args(argv)
+
+    units = [unit.strip() for unit in args.units.split(",") if unit.strip()]
+    genders = [gender.strip() for gender in args.genders.split(",") if gender.strip()]
+    speeds = [int(speed) for speed in args.speeds.split(",") if speed.strip()]
+    # 其他语速都由标准语速变速得到，需要先生成标准语速
+    if BASE_SPEED not in speeds:
+        speeds.insert(0, BASE_SPEED)
+    for gender in genders:
+        if gender not in ("female", "male"):
+            parser.error(f"不支持的语音性别: {gender}")
+
+    audio_dir = Path(args.audio_dir)
+    audio_dir.mkdir(parents=True, exist_ok=True)
+    words = load_words(args.source, units)
+    batches, skipped = plan_batches(words, audio_dir, genders, speeds, max(1, args.batch))
+    total = sum(len(items) for phase in batches for _, _, items in phase)
+    print(f"{len(words)} 个单词，{len(genders) * len(speeds)} 种语音设置: 需要生成 {total} 段，已存在 {skipped} 段")
+    if not total:
+        return 0
+
+    # 工作进程使用 spawn 启动，不继承主进程的线程；主进程的缓存只负责登记清单，不做淘汰
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=context, initializer=_init_worker)
+    cache = AudioCache(audio_dir, max_bytes=float("inf"))
+    rendered = 0
+    failed = 0
+    started = time.perf_counter()
+    last_save = started
+    try:
+        for phase in batches:
+            futures = {executor.submit(render_batch, str(audio_dir), gender, speed, items): (gender, speed, items)
+                       for gender, speed, items in phase}
+            for future in as_completed(futures):
+                gender, speed, items = futures[future]
+                try:
+                    done, error = future.result()
+                except Exception as e:
+                    done, error = [], str(e)
+                for key, text in done:
+                    cache.register(key, text, gender, speed)
+                rendered += len(done)
+                failed += len(items) - len(done)
+                if error:
+                    print(f"[{gender}/{speed}] {error}", file=sys.stderr)
+
+                now = time.perf_counter()
+                if now - last_save >= MANIFEST_SAVE_INTERVAL:
+                    cache.save_manifest()
+                    last_save = now
+                print(f"\r已生成 {rendered}/{total}，失败 {failed}，{rendered / max(now - started, 1e-9):.1f} 段/秒",
+                      end="", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("\n已中断，重新运行同样的命令即可继续", file=sys.stderr)
+        executor.shutdown(wait=False, cancel_futures=True)
+        return 130
+    finally:
+        cache.save_manifest()
+    executor.shutdown()
+    print(file=sys.stderr)
+
+    budget = int(os.environ.get("AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024
+    size = cache.stats()["bytes"]
+    print(f"完成: 生成 {rendered} 段，失败 {failed} 段，缓存共 {size / 1024 / 1024:.1f} MB")
+    if size > budget:
+        print(f"注意: 缓存超过应用的容量上限 {budget // 1024 // 1024} MB，"
+              f"启动应用时会按 LRU 淘汰，请相应调大 AUDIO_CACHE_MAX_MB", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+HISTORY_SIZE = 500  # 每个阶段保留最近多少次耗时
+BUCKET_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+# 关闭时返回的空上下文，不做任何计时
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "started")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+# 耗时分位数（输入已排序）
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# 按阶段统计耗时：进程级滚动直方图 + 当前线程（即当前会话的本次运行）的明细
+# enabled 为进程级开关（环境变量）；未开启时单个会话可以通过 begin_run(True) 只记录自己的运行
+class Profiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.history = {}
+        self.counts = {}
+        self.local = threading.local()
+
+    # 当前线程是否在记录耗时
+    @property
+    def active(self):
+        return self.enabled or getattr(self.local, "run", None) is not None
+
+    def stage(self, name):
+        if not self.active:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    # 装饰器形式，关闭时只多一次属性判断
+    def timed(self, name):
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.active:
+                    return fn(*args, **kwargs)
+                with _Stage(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, seconds):
+        with self.lock:
+            history = self.history.get(name)
+            if history is None:
+                history = self.history[name] = deque(maxlen=HISTORY_SIZE)
+            history.append(seconds)
+            self.counts[name] = self.counts.get(name, 0) + 1
+        run = getattr(self.local, "run", None)
+        if run is not None:
+            run.append((name, seconds))
+
+    # 开始本次运行的明细记录；session_enabled 为当前会话单独开启的分析
+    def begin_run(self, session_enabled=False):
+        self.local.run = [] if self.enabled or session_enabled else None
+
+    # 结束本次运行，返回各阶段耗时明细
+    def end_run(self):
+        run = getattr(self.local, "run", None)
+        self.local.run = None
+        return run
+
+    def summary(self):
+        with self.lock:
+            snapshot = {name: (list(history), self.counts[name]) for name, history in self.history.items()}
+        rows = []
+        for name, (values, count) in sorted(snapshot.items()):
+            values.sort()
+            buckets = [0] * (len(BUCKET_EDGES_MS) + 1)
+            for value in values:
+                ms = value * 1000
+                index = 0
+                while index < len(BUCKET_EDGES_MS) and ms > BUCKET_EDGES_MS[index]:
+                    index += 1
+                buckets[index] += 1
+            rows.append({
+                "stage": name,
+                "count": count,
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "p50_ms": round(_percentile(values, 0.5) * 1000, 3),
+                "p95_ms": round(_percentile(values, 0.95) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+                "histogram": buckets,
+            })
+        return rows
+
+    def reset(self):
+        with self.lock:
+            self.history = {}
+            self.counts = {}
+
+    # 导出为 JSON，便于比较不同部署
+    def to_json(self, **extra):
+        payload = {
+            "generated_at": time.time(),
+            "bucket_edges_ms": list(BUCKET_EDGES_MS),
+            "stages": self.summary(),
+        }
+        payload.update(extra)
+        return json.dumps(payload, ensure_ascii=False, indent=2)
+
+
+# 进程级共享的分析器，设置环境变量 WORD_APP_PROFILE=1 时默认开启
+profiler = Profiler(enabled=os.environ.get("WORD_APP_PROFILE") == "1")
@@ -0,0 +1,549 @@
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import scheduler
+from profiling import profiler
+from stats_table import StatsTable
+
+SQLITE_FILE_NAME = "progress.db"
+SCHEDULE_FIELDS = ("interval", "ease", "due", "reps")
+FLUSH_INTERVAL = 2.0  # 进度延迟写入磁盘的间隔（秒）
+
+
+# 新用户的空进度
+def empty_progress():
+    return {"known_words": {}, "word_stats": {}}
+
+
+# 合并同一批次里的操作：同一单词的答题次数累加，掌握状态和调度字段以最后一次为准
+def coalesce_ops(ops):
+    answers = {}
+    known = {}
+    schedules = {}
+    for op, word_id, value in ops:
+        word_id = str(word_id)
+        if op == "answer":
+            correct, wrong = answers.get(word_id, (0, 0))
+            if value:
+                correct += 1
+            else:
+                wrong += 1
+            answers[word_id] = (correct, wrong)
+        elif op == "known":
+            known[word_id] = bool(value)
+        elif op == "schedule":
+            schedules[word_id] = value
+        else:
+            raise ValueError(f"未知的进度操作: {op}")
+    return answers, known, schedules
+
+
+# 转换为可以写入 JSON 的普通字典（单词统计可能是按列存储的 StatsTable）
+def plain_progress(data):
+    word_stats = data.get("word_stats", {})
+    if isinstance(word_stats, StatsTable):
+        word_stats = word_stats.to_dict()
+    return {"known_words": dict(data.get("known_words", {})), "word_stats": word_stats}
+
+
+# 把一批操作应用到内存中的进度字典上
+def apply_ops(data, ops):
+    answers, known, schedules = coalesce_ops(ops)
+    word_stats = data.setdefault("word_stats", {})
+    for word_id, (correct, wrong) in answers.items():
+        stats = word_stats.setdefault(word_id, {"correct": 0, "wrong": 0})
+        stats["correct"] += correct
+        stats["wrong"] += wrong
+    for word_id, fields in schedules.items():
+        stats = word_stats.setdefault(word_id, {"correct": 0, "wrong": 0})
+        stats.update(fields)
+    known_words = data.setdefault("known_words", {})
+    for word_id, is_known in known.items():
+        if is_known:
+            known_words[word_id] = True
+        else:
+            known_words.pop(word_id, None)
+    return data
+
+
+# 旧版存储：每个用户一个 JSON 文件（写入改为临时文件 + 原子改名）
+class JsonProgressBackend:
+    def __init__(self, user_dir):
+        self.user_dir = Path(user_dir)
+        self.user_dir.mkdir(exist_ok=True, parents=True)
+        self.lock = threading.Lock()
+
+    def _user_file(self, user_id):
+        return self.user_dir / f"{user_id}.json"
+
+    def list_users(self):
+        return [f.stem for f in self.user_dir.glob("*.json") if f.is_file()]
+
+    # 每个用户的修改标记（文件修改时间和大小），用于判断哪些用户的进度有变化
+    def revisions(self):
+        tokens = {}
+        for user_file in self.user_dir.glob("*.json"):
+            try:
+                stat = user_file.stat()
+            except OSError:
+                continue
+            tokens[user_file.stem] = (stat.st_mtime_ns, stat.st_size)
+        return tokens
+
+    def load(self, user_id):
+        user_file = self._user_file(user_id)
+        if user_file.exists():
+            try:
+                with open(user_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return empty_progress()
+        return empty_progress()
+
+    def replace(self, user_id, data):
+        user_file = self._user_file(user_id)
+        tmp_file = user_file.with_name(f".{user_file.name}.{uuid.uuid4().hex}.tmp")
+        with self.lock:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(plain_progress(data), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, user_file)
+
+    def create(self, user_id):
+        self.replace(user_id, empty_progress())
+
+    def delete(self, user_id):
+        user_file = self._user_file(user_id)
+        if user_file.exists():
+            os.remove(user_file)
+
+    # JSON 文件只能整体重写
+    def apply(self, user_id, ops):
+        with self.lock:
+            data = apply_ops(self.load(user_id), ops)
+        self.replace(user_id, data)
+
+    def close(self):
+        pass
+
+
+# SQLite（WAL 模式）存储：每次答题只更新一行，同一批操作在一个事务里提交
+class SqliteProgressBackend:
+    def __init__(self, db_file):
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(exist_ok=True, parents=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_file), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.lock:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS users (
+                    name TEXT PRIMARY KEY,
+                    created REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS word_stats (
+                    user TEXT NOT NULL,
+                    word_id TEXT NOT NULL,
+                    correct INTEGER NOT NULL DEFAULT 0,
+                    wrong INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user, word_id)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS known_words (
+                    user TEXT NOT NULL,
+                    word_id TEXT NOT NULL,
+                    PRIMARY KEY (user, word_id)
+                ) WITHOUT ROWID;
+            """)
+            # 版本 1：增加间隔重复调度字段（旧数据为 NULL，读取时按计数推算）
+            schema_version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if schema_version < 1:
+                columns = {row[1] for row in self.conn.execute("PRAGMA table_info(word_stats)")}
+                for column, column_type in (("interval", "REAL"), ("ease", "REAL"), ("due", "REAL"), ("reps", "INTEGER")):
+                    if column not in columns:
+                        self.conn.execute(f"ALTER TABLE word_stats ADD COLUMN {column} {column_type}")
+                self.conn.execute("PRAGMA user_version = 1")
+            # 版本 2：用户修订号，每次写入该用户的进度时递增，班级统计据此只重新读取有变化的用户
+            if schema_version < 2:
+                columns = {row[1] for row in self.conn.execute("PRAGMA table_info(users)")}
+                if "revision" not in columns:
+                    self.conn.execute("ALTER TABLE users ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+                self.conn.execute("PRAGMA user_version = 2")
+
+    # 一个事务内执行，出错时整体回滚
+    def _transaction(self, fn):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self.conn)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def list_users(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT name FROM users ORDER BY created, name").fetchall()
+        return [row[0] for row in rows]
+
+    # 每个用户的修订号，用于判断哪些用户的进度有变化
+    def revisions(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT name, revision FROM users").fetchall())
+
+    # 只读取该用户自己的记录
+    def load(self, user_id):
+        data = empty_progress()
+        with self.lock:
+            for word_id, correct, wrong, interval, ease, due, reps in self.conn.execute(
+                    "SELECT word_id, correct, wrong, interval, ease, due, reps FROM word_stats WHERE user = ?",
+                    (user_id,)):
+                stats = {"correct": correct, "wrong": wrong}
+                if due is not None:
+                    stats.update(interval=interval, ease=ease, due=due, reps=reps)
+                data["word_stats"][word_id] = stats
+            for (word_id,) in self.conn.execute(
+                    "SELECT word_id FROM known_words WHERE user = ?", (user_id,)):
+                data["known_words"][word_id] = True
+        return data
+
+    def create(self, user_id):
+        self._transaction(lambda conn: conn.execute(
+            "INSERT OR IGNORE INTO users (name, created) VALUES (?, ?)", (user_id, time.time())))
+
+    def delete(self, user_id):
+        def run(conn):
+            conn.execute("DELETE FROM word_stats WHERE user = ?", (user_id,))
+            conn.execute("DELETE FROM known_words WHERE user = ?", (user_id,))
+            conn.execute("DELETE FROM users WHERE name = ?", (user_id,))
+        self._transaction(run)
+
+    # 整体替换某个用户的进度（重置进度、导入旧数据时使用）
+    def replace(self, user_id, data):
+        def run(conn):
+            conn.execute("INSERT OR IGNORE INTO users (name, created) VALUES (?, ?)", (user_id, time.time()))
+            conn.execute("DELETE FROM word_stats WHERE user = ?", (user_id,))
+            conn.execute("DELETE FROM known_words WHERE user = ?", (user_id,))
+            conn.executemany(
+                "INSERT INTO word_stats (user, word_id, correct, wrong, interval, ease, due, reps) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(user_id, str(word_id), stats.get("correct", 0), stats.get("wrong", 0))
+                 + tuple(stats.get(field) for field in SCHEDULE_FIELDS)
+                 for word_id, stats in data.get("word_stats", {}).items()]
+            )
+            conn.executemany(
+                "INSERT INTO known_words (user, word_id) VALUES (?, ?)",
+                [(user_id, str(word_id)) for word_id, known in data.get("known_words", {}).items() if known]
+            )
+            conn.execute("UPDATE users SET revision = revision + 1 WHERE name = ?", (user_id,))
+        self._transaction(run)
+
+    # 应用一批答题/标记操作：先合并，再在一个事务里逐行更新
+    def apply(self, user_id, ops):
+        answers, known, schedules = coalesce_ops(ops)
+
+        def run(conn):
+            conn.executemany(
+                "INSERT INTO word_stats (user, word_id, correct, wrong) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user, word_id) DO UPDATE SET "
+                "correct = correct + excluded.correct, wrong = wrong + excluded.wrong",
+                [(user_id, word_id, correct, wrong) for word_id, (correct, wrong) in answers.items()]
+            )
+            conn.executemany(
+                "INSERT INTO word_stats (user, word_id, interval, ease, due, reps) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (user, word_id) DO UPDATE SET "
+                "interval = excluded.interval, ease = excluded.ease, due = excluded.due, reps = excluded.reps",
+                [(user_id, word_id) + tuple(fields.get(field) for field in SCHEDULE_FIELDS)
+                 for word_id, fields in schedules.items()]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO known_words (user, word_id) VALUES (?, ?)",
+                [(user_id, word_id) for word_id, is_known in known.items() if is_known]
+            )
+            conn.executemany(
+                "DELETE FROM known_words WHERE user = ? AND word_id = ?",
+                [(user_id, word_id) for word_id, is_known in known.items() if not is_known]
+            )
+            conn.execute("UPDATE users SET revision = revision + 1 WHERE name = ?", (user_id,))
+        self._transaction(run)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# 学习统计汇总：总数随每次答题增量维护，错误率排序在按列存储的统计上向量化计算，数据变化后第一次读取时才重新排序
+class ProgressAggregates:
+    def __init__(self, data):
+        self.rebuild(data)
+
+    def rebuild(self, data):
+        self.known_words = data.get("known_words", {})
+        word_stats = data.get("word_stats", {})
+        self.table = word_stats if isinstance(word_stats, StatsTable) else StatsTable(word_stats)
+        self.attempted, self.total_correct, self.total_wrong = self.table.totals()
+
+    def _count(self, stats, sign):
+        self.total_correct += sign * stats.get("correct", 0)
+        self.total_wrong += sign * stats.get("wrong", 0)
+        if stats.get("correct", 0) + stats.get("wrong", 0) > 0:
+            self.attempted += sign
+
+    # 单个单词的统计变化：old_stats 为变化前的计数（新单词为 None）
+    def update(self, word_id, old_stats, new_stats):
+        if old_stats:
+            self._count(old_stats, -1)
+        self._count(new_stats, 1)
+
+    @property
+    def mastered(self):
+        return len(self.known_words)
+
+    # 按错误率从高到低依次给出 (单词 id, 错误率)，每次只转换一小段，调用方取够即可停止
+    def iter_hardest(self, chunk=16):
+        slots, rates = self.table.ranking()
+        ids = self.table.ids
+        for start in range(0, len(slots), chunk):
+            for slot, rate in zip(slots[start:start + chunk].tolist(), rates[start:start + chunk].tolist()):
+                word_id = ids[slot]
+                if word_id is not None:
+                    yield word_id, rate
+
+
+# 进程内共享的用户进度：同一用户的所有会话读写同一个对象，版本号随每次修改递增
+class UserProgress:
+    def __init__(self, user_id, data):
+        self.user_id = user_id
+        self.data = data
+        self.data.setdefault("known_words", {})
+        # 单词统计转为按列存储，内存占用远小于每个单词一个字典
+        self.data["word_stats"] = StatsTable(self.data.get("word_stats") or {})
+        self.aggregates = ProgressAggregates(self.data)
+        self.lock = threading.RLock()
+        self.pending = []
+        self.stats_version = 0
+        self.known_version = 0
+
+    @property
+    def version(self):
+        return self.stats_version + self.known_version
+
+    # 合并一个会话的操作，返回修改后的统计版本号
+    # 答题和标记同时作为一次复习结果，按 SM-2 更新该单词的调度字段
+    def record(self, ops, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            word_stats = self.data["word_stats"]
+            known_changed = False
+            for op, word_id, value in ops:
+                word_id = str(word_id)
+                before = dict(word_stats[word_id]) if word_id in word_stats else None
+                applied = [(op, word_id, value)]
+                if op == "answer":
+                    quality = scheduler.QUALITY_CORRECT if value else scheduler.QUALITY_WRONG
+                elif op == "known":
+                    quality = scheduler.QUALITY_KNOWN if value else scheduler.QUALITY_UNKNOWN
+                    known_changed = True
+                else:
+                    quality = None
+                if quality is not None:
+                    schedule = scheduler.review(before, quality, now)
+                    if schedule is not None:
+                        applied.append(("schedule", word_id, schedule))
+                apply_ops(self.data, applied)
+                self.pending.extend(applied)
+                if op == "answer":
+                    self.aggregates.update(word_id, before, word_stats[word_id])
+            if ops:
+                self.stats_version += 1
+            if known_changed:
+                self.known_version += 1
+            return self.stats_version
+
+    # 原地替换全部进度，其他会话持有的引用同样可见
+    def reset(self, data):
+        with self.lock:
+            self.data["known_words"].clear()
+            self.data["known_words"].update(data.get("known_words", {}))
+            self.data["word_stats"].clear()
+            self.data["word_stats"].update(data.get("word_stats", {}))
+            self.aggregates.rebuild(self.data)
+            self.pending = []
+            self.stats_version += 1
+            self.known_version += 1
+
+    def take_pending(self):
+        with self.lock:
+            ops, self.pending = self.pending, []
+            return ops
+
+    # 写入失败时把操作放回队列头部，下次重试
+    def restore_pending(self, ops):
+        with self.lock:
+            self.pending[:0] = ops
+
+
+# 进程级用户注册表：缓存用户列表和每个用户的进度对象，定时批量写回存储
+class UserRegistry:
+    def __init__(self, backend, user_dir, flush_interval=FLUSH_INTERVAL):
+        self.backend = backend
+        self.user_dir = Path(user_dir)
+        self.flush_interval = flush_interval
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()
+        self.users = {}
+        self.user_list = None
+        self.user_dir_mtime = None
+        self.wakeup = threading.Event()
+
+        self.worker = threading.Thread(target=self._run, name="progress-flush", daemon=True)
+        self.worker.start()
+        atexit.register(self.flush)
+
+    def _dir_mtime(self):
+        try:
+            return self.user_dir.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    # 用户列表常驻内存，目录有变化（例如手动放入文件）时才重新读取
+    def list_users(self):
+        mtime = self._dir_mtime()
+        with self.lock:
+            if self.user_list is None or mtime != self.user_dir_mtime:
+                self.user_list = self.backend.list_users()
+                self.user_dir_mtime = mtime
+            return list(self.user_list)
+
+    def _invalidate_users(self):
+        with self.lock:
+            self.user_list = None
+
+    def get(self, user_id):
+        with self.lock:
+            progress = self.users.get(user_id)
+            if progress is None:
+                with profiler.stage("disk:progress_load"):
+                    progress = UserProgress(user_id, self.backend.load(user_id))
+                self.users[user_id] = progress
+            return progress
+
+    def record(self, user_id, ops):
+        return self.get(user_id).record(ops)
+
+    # 整体替换（重置进度）：立即写入，丢弃尚未写入的增量
+    def replace(self, user_id, data):
+        progress = self.get(user_id)
+        with self.flush_lock, progress.lock:
+            progress.reset(data)
+            self.backend.replace(user_id, progress.data)
+
+    def create(self, user_id):
+        self.backend.create(user_id)
+        self._invalidate_users()
+
+    def delete(self, user_id):
+        with self.flush_lock:
+            with self.lock:
+                self.users.pop(user_id, None)
+            self.backend.delete(user_id)
+        self._invalidate_users()
+
+    # 把所有用户积攒的增量写入存储，每个用户一个事务
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                progresses = list(self.users.values())
+            for progress in progresses:
+                ops = progress.take_pending()
+                if not ops:
+                    continue
+                try:
+                    with profiler.stage("disk:progress_flush"):
+                        self.backend.apply(progress.user_id, ops)
+                except Exception:
+                    progress.restore_pending(ops)
+                    raise
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # 写入失败的操作已放回队列，下个周期重试
+                pass
+
+
+# 把旧版 users/*.json 导入到新存储中，已存在的用户跳过；返回导入的用户列表
+def migrate_json_users(json_dir, backend):
+    source = JsonProgressBackend(json_dir)
+    existing = set(backend.list_users())
+    imported = []
+    for user_id in source.list_users():
+        if user_id in existing:
+            continue
+        backend.replace(user_id, source.load(user_id))
+        imported.append(user_id)
+    return imported
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+# 获取进程级共享的进度存储，kind 为 "sqlite" 或 "json"
+def get_progress_backend(user_dir, kind="sqlite"):
+    key = (str(Path(user_dir).resolve()), kind)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            if kind == "json":
+                backend = JsonProgressBackend(user_dir)
+            elif kind == "sqlite":
+                db_file = Path(user_dir) / SQLITE_FILE_NAME
+                is_new = not db_file.exists()
+                backend = SqliteProgressBackend(db_file)
+                # 第一次启用 SQLite 时自动导入旧的 JSON 用户文件
+                if is_new:
+                    migrate_json_users(user_dir, backend)
+            else:
+                raise ValueError(f"未知的进度存储类型: {kind}")
+            _backends[key] = backend
+    return backend
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+# 获取进程级共享的用户注册表
+def get_user_registry(user_dir, kind="sqlite"):
+    key = (str(Path(user_dir).resolve()), kind)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = UserRegistry(get_progress_backend(user_dir, kind), user_dir)
+            _registries[key] = registry
+    return registry
+
+
+# 命令行迁移：python progress_store.py [users 目录]
+if __name__ == "__main__":
+    user_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("users")
+    backend = SqliteProgressBackend(user_dir / SQLITE_FILE_NAME)
+    imported = migrate_json_users(user_dir, backend)
+    backend.close()
+    print(f"已导入 {len(imported)} 个用户: {', '.join(imported)}")
@@ -0,0 +1,125 @@
+import random
+
+# 单词权重：错误越多、正确越少，出现概率越高（最小为 1）
+def word_weight(stats):
+    if not stats:
+        return 10
+    return max(1, 10 + (stats.get("wrong", 0) * 3) - stats.get("correct", 0))
+
+
+# 加权随机选择单词（每次都重新计算全部权重，O(n)）
+def get_weighted_random_word(word_list, user_stats):
+    if not word_list:
+        return None
+
+    weights = []
+    for word in word_list:
+        word_id = str(word["id"])
+        stats = user_stats.get(word_id, {"correct": 0, "wrong": 0})
+        weight = 10 + (stats["wrong"] * 3) - stats["correct"]
+        weight = max(1, weight)
+        weights.append(weight)
+
+    total_weight = sum(weights)
+    if total_weight <= 0:
+        return random.choice(word_list)
+
+    rand = random.uniform(0, total_weight)
+    cumulative = 0
+
+    for i, weight in enumerate(weights):
+        cumulative += weight
+        if rand < cumulative:
+            return word_list[i]
+
+    return random.choice(word_list)
+
+
+# 基于树状数组（Fenwick tree）的加权抽样器
+# 构建 O(n)，单个单词权重更新和一次抽样都是 O(log n)
+class WeightedSampler:
+    def __init__(self, words, user_stats, user=None, version=None):
+        self.words = words
+        self.user = user
+        # 构建时对应的统计版本号，由调用方维护
+        self.version = version
+        ids = [str(word["id"]) for word in words]
+        self.slot_by_id = {word_id: slot for slot, word_id in enumerate(ids)}
+
+        # 按列存储的统计一次算出全部权重，普通字典逐个计算
+        if hasattr(user_stats, "weights_for"):
+            self.weights = user_stats.weights_for(ids).tolist()
+        else:
+            self.weights = [word_weight(user_stats.get(word_id)) for word_id in ids]
+
+        # 线性时间建树：每个节点把自己的和累加到父节点
+        size = len(self.weights)
+        tree = [0] + self.weights
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.total = sum(self.weights)
+
+        # 抽样时自顶向下查找所需的最高位
+        self.top_bit = 1 << (size.bit_length() - 1) if size else 0
+
+    def __len__(self):
+        return len(self.weights)
+
+    def weight(self, word_id):
+        slot = self.slot_by_id.get(str(word_id))
+        return 0 if slot is None else self.weights[slot]
+
+    # 根据最新统计更新某个单词的权重，不在当前筛选范围内的单词直接忽略
+    def update(self, word_id, stats):
+        slot = self.slot_by_id.get(str(word_id))
+        if slot is None:
+            return
+
+        new_weight = word_weight(stats)
+        delta = new_weight - self.weights[slot]
+        if delta == 0:
+            return
+
+        self.weights[slot] = new_weight
+        self._add(slot, delta)
+
+    # 树中某个位置的权重加上 delta（不修改 self.weights）
+    def _add(self, slot, delta):
+        self.total += delta
+        i = slot + 1
+        size = len(self.weights)
+        while i <= size:
+            self.tree[i] += delta
+            i += i & -i
+
+    # 按权重抽取一个单词
+    def sample(self, rng=random):
+        return self.words[self._sample_slot(rng)] if self.total > 0 else None
+
+    # 按权重不放回地抽取最多 count 个不同的单词（考试出题）
+    # 抽中的单词暂时从树中减去权重，抽完后恢复，O(count log n)
+    def sample_distinct(self, count, rng=random):
+        picked = []
+        while len(picked) < count and self.total > 0:
+            slot = self._sample_slot(rng)
+            picked.append(slot)
+            self._add(slot, -self.weights[slot])
+        for slot in picked:
+            self._add(slot, self.weights[slot])
+        return [self.words[slot] for slot in picked]
+
+    def _sample_slot(self, rng):
+        rand = rng.randrange(self.total)
+        pos = 0
+        bit = self.top_bit
+        size = len(self.weights)
+        while bit:
+            nxt = pos + bit
+            if nxt <= size and self.tree[nxt] <= rand:
+                pos = nxt
+                rand -= self.tree[nxt]
+            bit >>= 1
+        return pos
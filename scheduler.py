@@ -0,0 +1,162 @@
+import heapq
+import time
+import zlib
+
+from sampler import word_weight
+
+# SM-2 间隔重复参数
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+DAY = 24 * 60 * 60
+RELEARN_DELAY = 10 * 60  # 答错后 10 分钟再复习
+SNOOZE_DELAY = 10 * 60  # 出现过但没有作答的单词，本会话内 10 分钟后再出现
+
+# 作答结果对应的 SM-2 评分（0-5，3 分及以上算记住）
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+QUALITY_KNOWN = 5
+QUALITY_UNKNOWN = 2
+
+
+# 读取单词的调度字段；旧数据只有 correct/wrong 计数时按计数推算初始值，计数本身保持不变
+def schedule_fields(stats):
+    if stats and stats.get("due") is not None:
+        return {
+            "interval": stats.get("interval", 0.0),
+            "ease": stats.get("ease", DEFAULT_EASE),
+            "due": stats["due"],
+            "reps": stats.get("reps", 0),
+        }
+
+    correct = stats.get("correct", 0) if stats else 0
+    wrong = stats.get("wrong", 0) if stats else 0
+    total = correct + wrong
+    ease = DEFAULT_EASE - 0.8 * (wrong / total) if total else DEFAULT_EASE
+    return {"interval": 0.0, "ease": max(MIN_EASE, ease), "due": None, "reps": 0}
+
+
+# 旧数据中练习过但没有调度信息的单词视为早已到期：按抽样权重排序（错误越多、正确越少越靠前），
+# 权重相同时按 id 的散列值打散，不会按 id 的字符串顺序成批出现
+def legacy_due(word_id, stats):
+    return -word_weight(stats) + zlib.crc32(str(word_id).encode("utf-8")) / 2 ** 32
+
+
+# 到期时间：从未练习过的新单词返回 None
+def due_time(word_id, stats):
+    if not stats:
+        return None
+    if stats.get("due") is not None:
+        return stats["due"]
+    if stats.get("correct", 0) + stats.get("wrong", 0) > 0:
+        return legacy_due(word_id, stats)
+    return None
+
+
+# 根据一次作答的评分计算新的调度字段（SM-2），调度不变时返回 None
+# 还没到期时答对（包括重复点击「认识」）不算一次复习；答错只让已记住的单词重新学习，已在重新学习中的不再降低难度系数
+def review(stats, quality, now=None):
+    now = time.time() if now is None else now
+    fields = schedule_fields(stats)
+    ease = fields["ease"]
+    reps = fields["reps"]
+    interval = fields["interval"]
+    if fields["due"] is not None and now < fields["due"] and (quality >= 3 or reps == 0):
+        return None
+
+    if quality < 3:
+        reps = 0
+        interval = 0.0
+        due = now + RELEARN_DELAY
+    else:
+        reps += 1
+        if reps == 1:
+            interval = 1.0
+        elif reps == 2:
+            interval = 6.0
+        else:
+            interval = round(max(interval, 1.0) * ease, 2)
+        due = now + interval * DAY
+
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return {"interval": interval, "ease": round(ease, 3), "due": due, "reps": reps}
+
+
+# 到期队列：当前筛选范围内已练习过的单词按到期时间组成最小堆
+# 更新时直接压入新条目，旧条目在出堆时按版本丢弃（惰性删除）
+class DueQueue:
+    def __init__(self, words, user_stats, user=None, version=None):
+        self.words = words
+        self.user = user
+        self.version = version
+        self.word_by_id = {str(word["id"]): word for word in words}
+        self.due = {}
+        ids = list(self.word_by_id)
+        # 按列存储的统计一次算出全部到期时间（NaN 表示没有），普通字典逐个计算
+        if hasattr(user_stats, "due_times_for"):
+            due_times = user_stats.due_times_for(ids)
+            picked = (due_times == due_times).nonzero()[0].tolist()
+            due_times = due_times.tolist()
+            heap = [(due_times[i], ids[i]) for i in picked]
+        else:
+            heap = [(due, word_id) for word_id in ids
+                    if (due := due_time(word_id, user_stats.get(word_id))) is not None]
+        self.due = {word_id: due for due, word_id in heap}
+        heapq.heapify(heap)
+        self.heap = heap
+
+    def __len__(self):
+        return len(self.due)
+
+    def _push(self, word_id, due):
+        self.due[word_id] = due
+        heapq.heappush(self.heap, (due, word_id))
+        # 过期条目过多时重建堆，防止无限增长
+        if len(self.heap) > 2 * len(self.due) + 64:
+            self.heap = [(due, word_id) for word_id, due in self.due.items()]
+            heapq.heapify(self.heap)
+
+    # 单词作答后更新到期时间，O(log n)
+    def update(self, word_id, stats):
+        word_id = str(word_id)
+        if word_id not in self.word_by_id:
+            return
+        due = due_time(word_id, stats)
+        if due is not None and self.due.get(word_id) != due:
+            self._push(word_id, due)
+
+    def _discard_stale(self):
+        heap = self.heap
+        while heap and self.due.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    # 最早到期的时间，队列为空时返回 None
+    def next_due(self):
+        self._discard_stale()
+        return self.heap[0][0] if self.heap else None
+
+    # 取出一个已到期的单词；为防止不作答就跳过的单词立刻丢失，先把它推迟一小段时间
+    def pop_due(self, now=None):
+        now = time.time() if now is None else now
+        self._discard_stale()
+        if not self.heap or self.heap[0][0] > now:
+            return None
+        due, word_id = heapq.heappop(self.heap)
+        self._push(word_id, now + SNOOZE_DELAY)
+        return self.word_by_id[word_id]
+
+    # 接下来最早到期的几个单词（不出堆，用于预取音频），沿堆的树结构做最优优先遍历，O(k log k)
+    def peek(self, count, now=None):
+        now = time.time() if now is None else now
+        heap = self.heap
+        result = []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and len(result) < count:
+            (due, word_id), i = heapq.heappop(frontier)
+            if due > now:
+                break
+            if self.due.get(word_id) == due:
+                result.append(self.word_by_id[word_id])
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return result
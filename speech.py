@@ -0,0 +1,261 @@
+import platform
+import re
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_cache import make_key
+from bootstrap import mark_tts_unavailable
+from profiling import profiler
+
+# 名字里不带性别时，用常见系统语音名推断性别（Windows SAPI5、macOS 等）
+VOICE_NAME_HINTS = {
+    "female": ("female", "woman", "zira", "hazel", "susan", "samantha", "victoria", "karen", "tessa", "moira"),
+    "male": ("male", "man", "david", "mark", "george", "alex", "daniel", "fred", "james"),
+}
+
+# espeak 没有区分性别的语音，通过变体后缀切换
+ESPEAK_VARIANTS = {"female": "+f3", "male": "+m3"}
+
+# 每个单词和语音只按标准语速合成一次，其他语速由它变速（不变调）得到
+BASE_SPEED = 150
+
+
+def _language_code(language):
+    if isinstance(language, bytes):
+        language = language.decode("utf-8", "ignore")
+    return str(language).lower()
+
+
+# 语音是否为英语：驱动声明的语言（espeak 为 b"\x05en-gb" 这样的字节串、macOS 为 "en_US"），或 id、名字中的 en / english
+def is_english(voice):
+    languages = getattr(voice, "languages", None) or ()
+    if languages:
+        return any(re.match(r"[^a-z]*en(?:[-_]|$)", _language_code(language)) for language in languages)
+    tokens = re.findall(r"[a-z]+", f"{voice.id} {getattr(voice, 'name', '')}".lower())
+    return "en" in tokens or "english" in tokens
+
+
+# 英语语音；列表中没有能判断为英语的语音时返回全部语音
+def english_voices(voices):
+    english = [voice for voice in voices if is_english(voice)]
+    return english or list(voices)
+
+
+# 在英语语音中查找指定性别的语音，找不到时返回 None（不会选到其他语言的语音）
+def match_voice(voices, gender):
+    voices = english_voices(voices)
+    # 优先使用驱动声明的性别（注意 "female" 包含 "male"，只能按整词比较）
+    for voice in voices:
+        declared = re.findall(r"[a-z]+", str(getattr(voice, "gender", "") or "").lower())
+        declared = [token.replace("voicegender", "") for token in declared]
+        if gender in declared:
+            return voice.id
+
+    hints = VOICE_NAME_HINTS[gender]
+    for voice in voices:
+        tokens = re.findall(r"[a-z]+", str(voice.name).lower())
+        if any(hint in tokens for hint in hints):
+            return voice.id
+    return None
+
+
+# TTS 引擎管理：进程内复用一个常驻引擎，语音 id 只解析一次，所有合成串行执行
+class EngineManager:
+    def __init__(self):
+        # pyttsx3 的引擎不能在多个线程里同时 runAndWait
+        self.lock = threading.Lock()
+        self.engine = None
+        self.voice_ids = {}
+
+    # 第一次合成时才导入 pyttsx3 并初始化引擎；初始化失败则整个进程切换为静音模式
+    def _get_engine(self):
+        if self.engine is None:
+            try:
+                import pyttsx3
+                self.engine = pyttsx3.init()
+            except Exception as e:
+                mark_tts_unavailable(e)
+                raise
+            self.voice_ids = {}
+        return self.engine
+
+    # 解析并缓存性别对应的语音 id（调用方需持有锁）
+    def _resolve_voice(self, engine, gender):
+        if gender not in self.voice_ids:
+            voices = engine.getProperty('voices')
+            voice_id = match_voice(voices, gender)
+            if voice_id is None and platform.system() == "Linux":
+                # espeak 在英语语音上加性别变体；默认语音不是英语时改用第一个英语语音
+                default_voice = engine.getProperty('voice')
+                english = english_voices(voices)
+                if english and all(voice.id != default_voice for voice in english):
+                    default_voice = english[0].id
+                if default_voice:
+                    voice_id = str(default_voice).split("+")[0] + ESPEAK_VARIANTS[gender]
+            self.voice_ids[gender] = voice_id
+        return self.voice_ids[gender]
+
+    def voice_id(self, gender):
+        with self.lock:
+            return self._resolve_voice(self._get_engine(), gender)
+
+    # 合成一批 (文本, 文件路径)，一次 runAndWait 处理全部条目
+    def synthesize(self, items, gender, speed):
+        with self.lock:
+            try:
+                engine = self._get_engine()
+                voice_id = self._resolve_voice(engine, gender)
+                if voice_id:
+                    engine.setProperty('voice', voice_id)
+                engine.setProperty('rate', speed)
+                for text, audio_file in items:
+                    engine.save_to_file(text, str(audio_file))
+                engine.runAndWait()
+            except Exception:
+                # 引擎出错后丢弃，下次调用重新初始化
+                self.engine = None
+                raise
+
+
+_engine_manager = None
+_engine_manager_lock = threading.Lock()
+
+
+# 获取进程级共享的引擎管理器
+def get_engine_manager():
+    global _engine_manager
+    with _engine_manager_lock:
+        if _engine_manager is None:
+            _engine_manager = EngineManager()
+    return _engine_manager
+
+
+# 同步合成一个单词的发音并保存为 wav 文件
+def synthesize(text, audio_file, gender, speed):
+    get_engine_manager().synthesize([(text, audio_file)], gender, speed)
+
+
+# 后台线程需要单独初始化 COM（Windows SAPI5）
+def _init_worker():
+    if platform.system() == "Windows":
+        try:
+            import comtypes
+            comtypes.CoInitialize()
+        except Exception:
+            pass
+
+
+# 音频预取：后台线程提前生成即将出现的单词发音，结果写入共享音频缓存
+class AudioPrefetcher:
+    def __init__(self, cache, max_workers=1):
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="audio-prefetch",
+            initializer=_init_worker
+        )
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    # 缓存键由单词拼写、语音和语速决定
+    def cache_key(self, word, gender, speed):
+        return make_key(word['en'], gender, speed)
+
+    def audio_path(self, word, gender, speed):
+        return self.cache.path_for(self.cache_key(word, gender, speed))
+
+    # 提交生成任务（已缓存或已在队列中则不重复提交），返回对应的 Future，已缓存时返回 None
+    def submit(self, word, gender, speed):
+        key = self.cache_key(word, gender, speed)
+        with self.lock:
+            future = self.pending.get(key)
+            if future is not None:
+                return future
+            if self.cache.lookup(key) is not None:
+                return None
+            future = self.executor.submit(self._render, key, word['en'], gender, speed)
+            self.pending[key] = future
+        return future
+
+    def is_pending(self, key):
+        with self.lock:
+            return key in self.pending
+
+    # 移除单词在指定语音设置下的音频，连同用于变速的标准语速音频（强制重新生成时使用）
+    def discard(self, word, gender, speed):
+        self.cache.discard(self.cache_key(word, gender, speed))
+        self.cache.discard(self.cache_key(word, gender, BASE_SPEED))
+
+    # 后台任务：生成完成后移除 pending 中的记录（同一个键只有 submit 登记的这一个任务）
+    def _render(self, key, text, gender, speed):
+        try:
+            return self._produce(key, text, gender, speed)
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    # 已缓存时直接返回（例如已在变速时顺带生成）；先写入临时文件再原子改名，读取方不会看到写了一半的音频
+    def _produce(self, key, text, gender, speed):
+        audio_file = self.cache.lookup(key)
+        if audio_file is not None:
+            return audio_file
+        part_file = self.cache.part_path(key)
+        try:
+            if speed == BASE_SPEED or not self._derive(part_file, text, gender, speed):
+                with profiler.stage("tts:synthesize"):
+                    synthesize(text, part_file, gender, speed)
+            return self.cache.commit(key, part_file, text, gender, speed)
+        finally:
+            if part_file.exists():
+                try:
+                    part_file.unlink()
+                except OSError:
+                    pass
+
+    # 由标准语速的音频变速得到指定语速（没有时先合成标准语速并缓存）
+    # 缺少 numpy 或音频不是 16 位 PCM 时返回 False，由调用方直接按该语速合成
+    def _derive(self, part_file, text, gender, speed):
+        try:
+            from timestretch import stretch_wav
+        except ImportError:
+            return False
+
+        base_key = make_key(text, gender, BASE_SPEED)
+        base = self.cache.read(base_key)
+        if base is None:
+            # 标准语速已在另一个工作线程中生成时等它完成；还在排队时直接在这里生成，排队的任务运行时会命中缓存
+            with self.lock:
+                future = self.pending.get(base_key)
+            if future is not None and future.running():
+                try:
+                    future.result()
+                except Exception:
+                    return False
+            else:
+                self._produce(base_key, text, gender, BASE_SPEED)
+            base = self.cache.read(base_key)
+            if base is None:
+                return False
+        try:
+            with profiler.stage("tts:stretch"):
+                data = stretch_wav(base, speed / BASE_SPEED)
+        except (ValueError, EOFError, wave.Error):
+            return False
+        part_file.write_bytes(data)
+        return True
+
+
+_prefetchers = {}
+_prefetchers_lock = threading.Lock()
+
+
+# 获取进程级共享的预取器，所有会话共用同一组后台线程
+def get_prefetcher(cache):
+    key = str(cache.root.resolve())
+    with _prefetchers_lock:
+        prefetcher = _prefetchers.get(key)
+        if prefetcher is None:
+            prefetcher = AudioPrefetcher(cache)
+            _prefetchers[key] = prefetcher
+    return prefetcher
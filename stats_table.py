@@ -0,0 +1,283 @@
+import zlib
+from collections.abc import MutableMapping
+
+import numpy as np
+
+# 每个用户的单词统计按列存储：单词 id -> 槽位，各字段是按槽位索引的 numpy 数组
+# 对外仍表现为 {单词 id: {"correct": n, "wrong": n, ...}} 的字典，只有需要导出 JSON 时才转换
+COUNT_FIELDS = ("correct", "wrong")
+SCHEDULE_FIELDS = ("interval", "ease", "due", "reps")
+FIELDS = COUNT_FIELDS + SCHEDULE_FIELDS
+INT_FIELDS = ("correct", "wrong", "reps")
+FIELD_BITS = {field: 1 << i for i, field in enumerate(FIELDS)}
+INITIAL_CAPACITY = 64
+DEFAULT_WEIGHT = 10  # 没有统计的单词的抽样权重，与 sampler.word_weight 一致
+
+
+# 单个单词的统计记录，读写直接作用在表的数组上
+class StatsRecord(MutableMapping):
+    __slots__ = ("_table", "_slot")
+
+    def __init__(self, table, slot):
+        self._table = table
+        self._slot = slot
+
+    def __getitem__(self, field):
+        return self._table.get_field(self._slot, field)
+
+    def __setitem__(self, field, value):
+        self._table.set_field(self._slot, field, value)
+
+    def __delitem__(self, field):
+        self._table.del_field(self._slot, field)
+
+    def __iter__(self):
+        return iter(self._table.fields(self._slot))
+
+    def __len__(self):
+        return len(self._table.fields(self._slot))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class StatsTable(MutableMapping):
+    def __init__(self, stats=None):
+        self.slots = {}
+        self.ids = []
+        self.free = []
+        self.extra = {}  # 不认识的字段或值为 None 的字段：槽位 -> 字典
+        self.version = 0  # 每次修改递增
+        # 按错误率排序的 (槽位, 错误率, 错误次数) 数组，第一次查询时建立，之后随每次修改增量调整
+        self._ranking = None
+        self._allocate(INITIAL_CAPACITY)
+        if stats:
+            for word_id, record in stats.items():
+                self[word_id] = record
+
+    def _allocate(self, capacity):
+        old = getattr(self, "present", None)
+        columns = {
+            "correct": np.int32, "wrong": np.int32, "reps": np.int32,
+            "interval": np.float64, "ease": np.float64, "due": np.float64,
+            "present": np.uint8,
+        }
+        for name, dtype in columns.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                column[:len(old)] = getattr(self, name)
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def _new_slot(self, word_id):
+        if self.free:
+            slot = self.free.pop()
+            self.ids[slot] = word_id
+        else:
+            slot = len(self.ids)
+            if slot == self.capacity:
+                self._allocate(self.capacity * 2)
+            self.ids.append(word_id)
+        self.slots[word_id] = slot
+        return slot
+
+    # slot 为 None 表示整表变化（丢弃排序），否则只调整该槽位在排序中的位置（只有答题次数会影响排序）
+    def _touch(self, slot=None, field=None):
+        self.version += 1
+        if slot is None:
+            self._ranking = None
+        elif self._ranking is not None and (field is None or field in COUNT_FIELDS):
+            self._rerank(slot)
+
+    # 单个字段的读写
+    def fields(self, slot):
+        present = int(self.present[slot])
+        names = [field for field in FIELDS if present & FIELD_BITS[field]]
+        extra = self.extra.get(slot)
+        if extra:
+            names.extend(field for field in extra if field not in names)
+        return names
+
+    def get_field(self, slot, field):
+        bit = FIELD_BITS.get(field)
+        if bit is not None and self.present[slot] & bit:
+            value = getattr(self, field)[slot]
+            return int(value) if field in INT_FIELDS else float(value)
+        extra = self.extra.get(slot)
+        if extra is not None and field in extra:
+            return extra[field]
+        raise KeyError(field)
+
+    def set_field(self, slot, field, value):
+        self._set(slot, field, value)
+        self._touch(slot, field)
+
+    def _set(self, slot, field, value):
+        bit = FIELD_BITS.get(field)
+        if bit is not None and isinstance(value, (int, float)) and not isinstance(value, bool):
+            getattr(self, field)[slot] = value
+            self.present[slot] |= bit
+            extra = self.extra.get(slot)
+            if extra is not None:
+                extra.pop(field, None)
+        else:
+            if bit is not None:
+                self.present[slot] &= ~bit & 0xFF
+            self.extra.setdefault(slot, {})[field] = value
+
+    def del_field(self, slot, field):
+        bit = FIELD_BITS.get(field)
+        if bit is not None and self.present[slot] & bit:
+            self.present[slot] &= ~bit & 0xFF
+            getattr(self, field)[slot] = 0
+        else:
+            extra = self.extra.get(slot)
+            if extra is None or field not in extra:
+                raise KeyError(field)
+            del extra[field]
+        self._touch(slot, field)
+
+    # 字典接口
+    def __getitem__(self, word_id):
+        return StatsRecord(self, self.slots[word_id])
+
+    def __setitem__(self, word_id, record):
+        record = dict(record)
+        slot = self.slots.get(word_id)
+        if slot is None:
+            slot = self._new_slot(word_id)
+        self._clear_slot(slot)
+        for field, value in record.items():
+            self._set(slot, field, value)
+        self._touch(slot)
+
+    def __delitem__(self, word_id):
+        slot = self.slots.pop(word_id)
+        self._clear_slot(slot)
+        self.ids[slot] = None
+        self.free.append(slot)
+        self._touch(slot)
+
+    def _clear_slot(self, slot):
+        for field in FIELDS:
+            getattr(self, field)[slot] = 0
+        self.present[slot] = 0
+        self.extra.pop(slot, None)
+
+    def __contains__(self, word_id):
+        return word_id in self.slots
+
+    def __iter__(self):
+        return iter(self.slots)
+
+    def __len__(self):
+        return len(self.slots)
+
+    # 与 dict.setdefault 一致，返回表中的记录（而不是传入的默认值）
+    def setdefault(self, word_id, default=None):
+        if word_id not in self.slots:
+            self[word_id] = default or {}
+        return self[word_id]
+
+    def clear(self):
+        self.slots = {}
+        self.ids = []
+        self.free = []
+        self.extra = {}
+        self.present = None
+        self._allocate(INITIAL_CAPACITY)
+        self._touch()
+
+    # 导出为普通字典（写 JSON 时使用）
+    def to_dict(self):
+        return {word_id: dict(self[word_id]) for word_id in self.slots}
+
+    # 向量化计算
+    def _slots_for(self, word_ids):
+        slots = self.slots
+        return np.fromiter((slots.get(word_id, -1) for word_id in word_ids), dtype=np.int64)
+
+    # 一批单词的抽样权重：max(1, 10 + 3 * 错误 - 正确)，没有记录的单词为 10
+    def weights_for(self, word_ids):
+        slots = self._slots_for(word_ids)
+        weights = np.full(len(slots), DEFAULT_WEIGHT, dtype=np.int64)
+        known = slots >= 0
+        picked = slots[known]
+        weights[known] = np.maximum(
+            1, DEFAULT_WEIGHT + 3 * self.wrong[picked].astype(np.int64) - self.correct[picked])
+        return weights
+
+    # 一批单词的到期时间（与 scheduler.due_time 一致），没有到期时间的为 NaN
+    def due_times_for(self, word_ids):
+        slots = self._slots_for(word_ids)
+        due = np.full(len(slots), np.nan)
+        known = np.flatnonzero(slots >= 0)
+        picked = slots[known]
+        scheduled = (self.present[picked] & FIELD_BITS["due"]) != 0
+        attempted = (self.correct[picked].astype(np.int64) + self.wrong[picked]) > 0
+        due[known[scheduled]] = self.due[picked[scheduled]]
+        # 旧数据没有调度信息：-抽样权重 + id 散列值打散（scheduler.legacy_due）
+        legacy = known[attempted & ~scheduled]
+        if len(legacy):
+            weights = self.weights_for([word_ids[i] for i in legacy.tolist()])
+            ties = np.fromiter((zlib.crc32(str(word_ids[i]).encode("utf-8")) for i in legacy.tolist()),
+                               dtype=np.float64, count=len(legacy)) / 2 ** 32
+            due[legacy] = ties - weights
+        return due
+
+    def _live(self):
+        size = len(self.ids)
+        live = np.zeros(size, dtype=bool)
+        if self.slots:
+            live[np.fromiter(self.slots.values(), dtype=np.int64, count=len(self.slots))] = True
+        return live
+
+    # (已练习单词数, 总正确次数, 总错误次数)
+    def totals(self):
+        live = self._live()
+        correct = self.correct[:len(live)][live].astype(np.int64)
+        wrong = self.wrong[:len(live)][live].astype(np.int64)
+        return int(np.count_nonzero(correct + wrong)), int(correct.sum()), int(wrong.sum())
+
+    # 按错误率从高到低排序的槽位和错误率（错误率相同时错误次数多的在前，再按槽位），只包含练习过的单词
+    # 第一次调用时整体排序，之后每次修改由 _rerank 调整一个位置，不再重新排序
+    def ranking(self):
+        if self._ranking is None:
+            live = self._live()
+            slots = np.flatnonzero(live)
+            correct = self.correct[slots].astype(np.int64)
+            wrong = self.wrong[slots].astype(np.int64)
+            total = correct + wrong
+            attempted = total > 0
+            slots, wrong, total = slots[attempted], wrong[attempted], total[attempted]
+            rates = wrong / total
+            order = np.lexsort((slots, -wrong, -rates))
+            self._ranking = (slots[order], rates[order], wrong[order])
+        return self._ranking[:2]
+
+    # 把一个槽位从排序中移除，再按当前的答题次数二分插入新位置
+    def _rerank(self, slot):
+        slots, rates, wrongs = self._ranking
+        found = np.flatnonzero(slots == slot)
+        if len(found):
+            index = int(found[0])
+            slots, rates, wrongs = np.delete(slots, index), np.delete(rates, index), np.delete(wrongs, index)
+        correct = int(self.correct[slot])
+        wrong = int(self.wrong[slot])
+        if self.ids[slot] is not None and correct + wrong > 0:
+            rate = wrong / (correct + wrong)
+            lo, hi = _descending_range(rates, 0, len(rates), rate)
+            lo, hi = _descending_range(wrongs, lo, hi, wrong)
+            index = lo + int(np.searchsorted(slots[lo:hi], slot))
+            slots = np.insert(slots, index, slot)
+            rates = np.insert(rates, index, rate)
+            wrongs = np.insert(wrongs, index, wrong)
+        self._ranking = (slots, rates, wrongs)
+
+
+# 降序数组 values[lo:hi] 中等于 value 的区间 [start, end)
+def _descending_range(values, lo, hi, value):
+    reverse = values[lo:hi][::-1]
+    size = hi - lo
+    return (lo + size - int(np.searchsorted(reverse, value, side="right")),
+            lo + size - int(np.searchsorted(reverse, value, side="left")))
@@ -1,15 +1,19 @@
+import time
+RUN_STARTED = time.perf_counter()  # 本次脚本运行的开始时间
+
 import streamlit as st
-import json
-import random
 import os
-import base64
 from pathlib import Path
-import pyttsx3
-import time
-import platform
-
-if platform.system() == "Linux":
-    os.system('apt-get install -y espeak')
+from bootstrap import detect_tts, record_run, startup_report
+from profiling import profiler
+from word_store import filter_words, load_vocabulary, vocabulary_file
+from library import get_library, get_shard_cache
+from sampler import WeightedSampler
+from scheduler import DueQueue
+from speech import get_prefetcher
+from audio_cache import get_audio_cache
+from progress_store import get_user_registry
+from dashboard import get_class_rollup
 
 # 应用标题和配置
 st.set_page_config(page_title="英语单词背诵工具", layout="wide")
@@ -18,7 +22,17 @@ st.title("📚 英语单词背诵工具")
 # 常量定义
 USER_DATA_DIR = Path("users")
 WORD_DATA_FILE = Path("main.json")
+LIBRARY_DIR = Path(os.environ.get("WORD_LIBRARY_DIR", "books"))  # 按单元分片的词书目录，存在词书时优先使用
+SHARD_CACHE_MAX_WORDS = int(os.environ.get("SHARD_CACHE_MAX_WORDS", "200000"))  # 分片缓存最多保留的单词数
 AUDIO_DIR = Path("audio")
+PREFETCH_AHEAD = 3  # 预先抽取并生成音频的单词数量
+WORD_LIST_PAGE_SIZES = [12, 30, 60]  # 单词列表每页显示数量可选项
+EXAM_SIZES = [10, 20, 50, 100]  # 考试每轮题目数量可选项
+PROGRESS_BACKEND = os.environ.get("PROGRESS_BACKEND", "sqlite")  # 学习进度存储方式: sqlite 或 json
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024  # 音频缓存容量上限
+DASHBOARD_REFRESH_SECONDS = 30  # 班级统计自动刷新的最短间隔
+# 可以查看班级统计的老师账号（逗号分隔），未设置时不开放班级统计
+TEACHER_USERS = frozenset(name.strip() for name in os.environ.get("WORD_APP_TEACHERS", "").split(",") if name.strip())
 USER_DATA_DIR.mkdir(exist_ok=True, parents=True)
 AUDIO_DIR.mkdir(exist_ok=True, parents=True)
 
@@ -28,6 +42,7 @@ def init_session_state():
         'current_word': None,
         'show_answer': False,
         'word_list': [],
+        'book': None,  # 词书模式下当前选择的词书
         'filtered_words': [],
         'study_mode': "flashcard",
         'current_user': None,
@@ -39,12 +54,18 @@ def init_session_state():
         'quiz_options': None,
         'quiz_answer': None,
         'flashcard_feedback': None,
+        'current_mark': None,  # 当前这次出现的单词已经标记的结果，重复点击同一个按钮不再记录
         'voice_gender': "female",
         'voice_speed': 150,
         'audio_generated': False,
         'audio_refreshed': False,
         'last_voice_settings': {"gender": "female", "speed": 150},  # 记录上次语音设置
-        'current_audio_file': None  # 存储当前音频文件路径
+        'current_audio_file': None,  # 存储当前音频文件路径
+        'word_sampler': None,  # 当前用户和筛选条件下的加权抽样器
+        'upcoming_words': [],  # 预先抽取的后续单词队列
+        'due_queue': None,  # 当前用户和筛选条件下的复习到期队列
+        'exam': None,  # 当前一轮考试：题目、选项、开始时间和成绩
+        'exam_round': 0  # 考试轮次，用作答题控件 key 的一部分
     }
     
     for key, value in session_defaults.items():
@@ -54,164 +75,229 @@ def init_session_state():
 init_session_state()
 
 # 用户管理函数
+# 同一用户的所有会话共享一个进度对象，修改定时批量写入存储
+def get_registry():
+    return get_user_registry(USER_DATA_DIR, PROGRESS_BACKEND)
+
 def load_user_data(user_id):
-    user_file = USER_DATA_DIR / f"{user_id}.json"
-    if user_file.exists():
-        try:
-            with open(user_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {"known_words": {}, "word_stats": {}}
-    return {"known_words": {}, "word_stats": {}}
+    try:
+        return get_registry().get(user_id).data
+    except Exception:
+        return {"known_words": {}, "word_stats": {}}
 
+# 整体保存用户进度（仅用于重置等整体替换的场景）
 def save_user_data(user_id, data):
-    user_file = USER_DATA_DIR / f"{user_id}.json"
-    with open(user_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    get_registry().replace(user_id, data)
+
+# 记录答题或标记操作，返回修改后的统计版本号
+# 期间没有其他会话修改时，增量更新本会话的抽样器和到期队列，否则留待下次使用时重建
+def record_progress(user_id, ops):
+    version = get_registry().record(user_id, ops)
+    word_stats = get_registry().get(user_id).data["word_stats"]
+    for index in (st.session_state.word_sampler, st.session_state.due_queue):
+        if index is not None and index.user == user_id and index.version == version - 1:
+            for word_id in {str(word_id) for _, word_id, _ in ops}:
+                if word_id in word_stats:
+                    index.update(word_id, word_stats[word_id])
+            index.version = version
+    return version
 
 def get_all_users():
-    return [f.stem for f in USER_DATA_DIR.glob("*.json") if f.is_file()]
+    return get_registry().list_users()
 
-# 加载单词数据
-def load_word_data():
-    if st.session_state.word_loaded:
-        return
-    
+# 词书列表和当前选择的词书，每次运行只解析一次；没有词书目录时词书为 None，使用 main.json
+def current_book():
+    books = get_library(LIBRARY_DIR).list_books()
+    if not books:
+        return books, None
+    if st.session_state.book not in books:
+        st.session_state.book = next(iter(books))
+    return books, books[st.session_state.book]
+
+# 按 id 查找单词：词书模式下在整本词书中查找（只加载单词所在的分片），不限于当前选中的单元
+def lookup_word(book, word_id):
+    if book is None:
+        return st.session_state.word_list.get(word_id)
+    return get_shard_cache(SHARD_CACHE_MAX_WORDS).get_word(book, word_id)
+
+# 单词 id -> 所在单元的查找函数，词书模式下使用词书目录中的 id 列表
+def word_unit_lookup(book):
+    if book is not None:
+        return get_shard_cache(SHARD_CACHE_MAX_WORDS).word_units(book).get
+    vocab = st.session_state.word_list
+    def unit_of(word_id):
+        word = vocab.get(word_id)
+        return None if word is None else word.get("unit", "")
+    return unit_of
+
+# 加载单词数据（所有会话共享同一份词库，文件修改后自动重新加载）
+# 词书模式下只加载选中单元的分片，没有选择单元时加载整本词书
+@profiler.timed("load_word_data")
+def load_word_data(book):
     try:
-        if WORD_DATA_FILE.exists():
-            with open(WORD_DATA_FILE, 'r', encoding='utf-8') as f:
-                word_data = json.load(f)
-                st.session_state.word_list = word_data
-                st.session_state.filtered_words = word_data.copy()
-                st.session_state.word_loaded = True
+        if book is not None:
+            vocab = get_shard_cache(SHARD_CACHE_MAX_WORDS).load_units(book, st.session_state.unit_filter)
+        elif vocabulary_file(WORD_DATA_FILE).exists():
+            vocab = load_vocabulary(WORD_DATA_FILE)
         else:
             st.error(f"未找到单词文件: {WORD_DATA_FILE}")
+            return
+        if st.session_state.word_list is not vocab:
+            st.session_state.word_list = vocab
+            st.session_state.filtered_words = vocab
+        st.session_state.word_loaded = True
     except Exception as e:
         st.error(f"单词文件解析错误: {e}")
 
-# 生成单词发音
-def generate_audio(word, force_refresh=False):
-    # 使用当前语音设置创建音频文件名
+# 获取共享的音频预取器（所有会话共用同一个音频缓存）
+def get_audio_prefetcher():
+    return get_prefetcher(get_audio_cache(AUDIO_DIR, AUDIO_CACHE_MAX_BYTES))
+
+# 获取单词在当前语音设置下的音频缓存键
+def get_audio_key(word):
+    return get_audio_prefetcher().cache_key(
+        word, st.session_state.voice_gender, st.session_state.voice_speed
+    )
+
+# 语音合成是否可用（每个进程只检测一次；不可用时进入静音模式）
+def tts_available():
+    return detect_tts()["available"]
+
+# 生成单词发音（wait=False 时只提交后台任务，不阻塞页面）
+@profiler.timed("generate_audio")
+def generate_audio(word, force_refresh=False, wait=True):
+    if not tts_available():
+        return None
+    
+    # 使用当前语音设置确定缓存键
     gender = st.session_state.voice_gender
     speed = st.session_state.voice_speed
-    audio_file = AUDIO_DIR / f"{word['id']}_{gender}_{speed}.wav"
+    prefetcher = get_audio_prefetcher()
+    audio_file = prefetcher.audio_path(word, gender, speed)
     
-    # 如果强制刷新或文件不存在，则生成新音频
-    if force_refresh or not audio_file.exists():
-        try:
-            # 如果文件存在且需要强制刷新，先删除旧文件
-            if audio_file.exists() and force_refresh:
-                try:
-                    # 尝试删除文件，如果失败则等待后重试
-                    for attempt in range(3):
-                        try:
-                            audio_file.unlink()
-                            break
-                        except PermissionError:
-                            if attempt < 2:
-                                time.sleep(0.5)  # 等待0.5秒后重试
-                            else:
-                                st.warning(f"无法删除旧音频文件，可能是文件正在使用中: {audio_file.name}")
-                except Exception as e:
-                    st.warning(f"删除旧音频文件失败: {e}")
-            
-            engine = pyttsx3.init()
-            voices = engine.getProperty('voices')
-            
-            if gender == "female":
-                for voice in voices:
-                    if "female" in voice.name.lower():
-                        engine.setProperty('voice', voice.id)
-                        break
-            else:
-                for voice in voices:
-                    if "male" in voice.name.lower():
-                        engine.setProperty('voice', voice.id)
-                        break
-            
-            engine.setProperty('rate', speed)
-            engine.save_to_file(word['en'], str(audio_file))
-            engine.runAndWait()
-            
+    # 需要强制刷新时，先从缓存中移除旧音频
+    if force_refresh:
+        prefetcher.discard(word, gender, speed)
+    
+    # 缓存中没有时交给后台预取线程生成（已在生成中的不会重复提交）
+    try:
+        future = prefetcher.submit(word, gender, speed)
+        if future is None:
             return audio_file
-        except Exception as e:
-            st.error(f"语音生成失败: {e}")
-            return None
-    else:
-        return audio_file
-
-# 获取音频文件的base64编码
-def get_audio_base64(audio_file):
-    if audio_file and audio_file.exists():
-        with open(audio_file, 'rb') as f:
-            audio_bytes = f.read()
-        return base64.b64encode(audio_bytes).decode('utf-8')
+        if not wait:
+            return audio_file if future.done() and audio_file.exists() else None
+        return future.result()
+    except Exception as e:
+        st.error(f"语音生成失败: {e}")
+        return None
+
+# 提前生成接下来几个单词的发音
+def prefetch_audio(words):
+    if not tts_available():
+        return
+    prefetcher = get_audio_prefetcher()
+    for word in words:
+        prefetcher.submit(word, st.session_state.voice_gender, st.session_state.voice_speed)
+
+# 读取音频内容（进程内存中缓存最近播放过的音频）
+@profiler.timed("disk:audio_read")
+def get_audio_bytes(audio_file):
+    if audio_file:
+        return get_audio_cache(AUDIO_DIR, AUDIO_CACHE_MAX_BYTES).read(audio_file.stem)
     return None
 
-# 加权随机选择单词
-def get_weighted_random_word(word_list, user_stats):
-    if not word_list:
-        return None
-    
-    weights = []
-    for word in word_list:
-        word_id = str(word["id"])
-        stats = user_stats.get(word_id, {"correct": 0, "wrong": 0})
-        weight = 10 + (stats["wrong"] * 3) - stats["correct"]
-        weight = max(1, weight)
-        weights.append(weight)
-    
-    total_weight = sum(weights)
-    if total_weight <= 0:
-        return random.choice(word_list)
-    
-    rand = random.uniform(0, total_weight)
-    cumulative = 0
-    
-    for i, weight in enumerate(weights):
-        cumulative += weight
-        if rand < cumulative:
-            return word_list[i]
-    
-    return random.choice(word_list)
+# 获取当前用户和筛选条件对应的抽样器，筛选结果或用户变化时重建
+def get_word_sampler():
+    sampler = st.session_state.word_sampler
+    progress = get_registry().get(st.session_state.current_user)
+    # 其他会话（例如同一用户的另一个标签页）修改了统计时也需要重建
+    if (sampler is None or
+        sampler.words is not st.session_state.filtered_words or
+        sampler.user != st.session_state.current_user or
+        sampler.version != progress.stats_version):
+        sampler = WeightedSampler(
+            st.session_state.filtered_words,
+            progress.data["word_stats"],
+            user=st.session_state.current_user,
+            version=progress.stats_version
+        )
+        st.session_state.word_sampler = sampler
+        st.session_state.upcoming_words = []
+    return sampler
+
+# 获取当前用户和筛选条件对应的复习到期队列，规则同抽样器
+def get_due_queue():
+    queue = st.session_state.due_queue
+    progress = get_registry().get(st.session_state.current_user)
+    if (queue is None or
+        queue.words is not st.session_state.filtered_words or
+        queue.user != st.session_state.current_user or
+        queue.version != progress.stats_version):
+        queue = DueQueue(
+            st.session_state.filtered_words,
+            progress.data["word_stats"],
+            user=st.session_state.current_user,
+            version=progress.stats_version
+        )
+        st.session_state.due_queue = queue
+    return queue
 
 # 筛选选项
+# 筛选结果是词库位置数组视图，按 (词库, 单元, 词性, 复习模式, 用户, 已掌握版本) 缓存，条件不变时不做任何计算
+@profiler.timed("apply_filters")
 def apply_filters():
+    vocab = st.session_state.word_list
     # 确保单词列表存在
-    if not st.session_state.word_list:
+    if not vocab:
         st.session_state.filtered_words = []
         return
     
-    filtered = st.session_state.word_list.copy()
-    
-    # 单元筛选
-    if st.session_state.unit_filter:
-        # 将单词单元转换为字符串进行比较
-        filtered = [w for w in filtered if str(w.get("unit", "")) in st.session_state.unit_filter]
-    
-    # 词性筛选
-    if st.session_state.type_filter:
-        filtered = [w for w in filtered if w.get("type", "") in st.session_state.type_filter]
-    
-    # 复习模式筛选
-    if st.session_state.review_mode:
-        # 确保用户数据存在
-        user_data = st.session_state.user_data
-        if "known_words" in user_data:
-            # 只保留标记为已掌握的单词
-            filtered = [w for w in filtered if str(w["id"]) in user_data["known_words"]]
+    # 单元、词性视图由词库缓存并在会话间共享；复习模式只保留标记为已掌握的单词
+    review_mode = st.session_state.review_mode and st.session_state.current_user is not None
+    progress = get_registry().get(st.session_state.current_user) if review_mode else None
+    key = (
+        frozenset(st.session_state.unit_filter),
+        frozenset(st.session_state.type_filter),
+        review_mode,
+        progress.known_version if progress else None
+    )
+    cached = st.session_state.get("filter_view")
+    if cached and cached[0] is vocab and cached[1] is progress and cached[2] == key:
+        view = cached[3]
+    else:
+        view = filter_words(
+            vocab,
+            st.session_state.unit_filter,
+            st.session_state.type_filter,
+            progress.data["known_words"] if progress else None
+        )
+        st.session_state.filter_view = (vocab, progress, key, view)
     
-    st.session_state.filtered_words = filtered
+    # 视图对象不变时抽样器等缓存继续有效
+    if st.session_state.filtered_words is not view:
+        st.session_state.filtered_words = view
 
 # 获取新单词
 def get_new_word():
     if st.session_state.filtered_words and st.session_state.current_user:
-        st.session_state.current_word = get_weighted_random_word(
-            st.session_state.filtered_words,
-            st.session_state.user_data.get("word_stats", {})
-        )
+        sampler = get_word_sampler()
+        due_queue = get_due_queue()
+        upcoming = st.session_state.upcoming_words
+        
+        # 优先复习已到期的单词（O(log n) 出堆）；没有到期单词时按权重抽取，优先使用预先抽取的单词
+        word = due_queue.pop_due()
+        if word is None:
+            word = upcoming.pop(0) if upcoming else sampler.sample()
+        st.session_state.current_word = word
+        
+        # 补足预取队列，并提前生成接下来可能出现的单词的发音
+        while len(upcoming) < PREFETCH_AHEAD and len(sampler) > 0:
+            upcoming.append(sampler.sample())
+        prefetch_audio([word] + due_queue.peek(PREFETCH_AHEAD) + upcoming)
+        
         st.session_state.show_answer = False
         st.session_state.flashcard_feedback = None
+        st.session_state.current_mark = None
         st.session_state.quiz_options = None
         st.session_state.quiz_answer = None
         st.session_state.audio_generated = False
@@ -225,41 +311,23 @@ def update_word_stats(word_id, is_correct):
     if not st.session_state.current_user:
         return
     
-    word_id = str(word_id)
-    user_data = st.session_state.user_data
-    
-    if "word_stats" not in user_data:
-        user_data["word_stats"] = {}
-    
-    if word_id not in user_data["word_stats"]:
-        user_data["word_stats"][word_id] = {"correct": 0, "wrong": 0}
-    
-    if is_correct:
-        user_data["word_stats"][word_id]["correct"] += 1
-    else:
-        user_data["word_stats"][word_id]["wrong"] += 1
-    
-    save_user_data(st.session_state.current_user, user_data)
-    st.session_state.user_data = user_data
+    record_progress(st.session_state.current_user, [("answer", str(word_id), is_correct)])
+    st.session_state.user_data = load_user_data(st.session_state.current_user)
 
-# 标记单词
-def mark_word(known=True):
-    if st.session_state.current_word and st.session_state.current_user:
-        word_id = str(st.session_state.current_word["id"])
-        user_data = st.session_state.user_data
-        
-        if "known_words" not in user_data:
-            user_data["known_words"] = {}
-        
-        if known:
-            user_data["known_words"][word_id] = True
-        elif word_id in user_data["known_words"]:
-            del user_data["known_words"][word_id]
-        
-        save_user_data(st.session_state.current_user, user_data)
-        st.session_state.user_data = user_data
+# 标记单词（默认标记当前单词；当前单词的同一次出现中重复同样的标记不再记录）
+def mark_word(known=True, word=None):
+    if word is None:
+        word = st.session_state.current_word
+        if st.session_state.current_mark == known:
+            return
+        st.session_state.current_mark = known
+    if word and st.session_state.current_user:
+        word_id = str(word["id"])
+        record_progress(st.session_state.current_user, [("known", word_id, known)])
+        st.session_state.user_data = load_user_data(st.session_state.current_user)
 
 # 单词卡片模式
+@profiler.timed("flashcard_mode")
 def flashcard_mode():
     if not st.session_state.current_word and st.session_state.filtered_words:
         get_new_word()
@@ -280,19 +348,17 @@ def flashcard_mode():
              st.session_state.audio_refreshed or
              current_settings != st.session_state.last_voice_settings)):
             
-            # 强制刷新音频（如果设置了刷新标志）
-            force_refresh = st.session_state.audio_refreshed or (current_settings != st.session_state.last_voice_settings)
+            # 只有点击刷新时才强制重新生成（语音设置变化时文件名本身就不同）
+            # 不等待合成完成，音频未就绪时下次刷新页面再检查
             generated_audio = generate_audio(
                 word, 
-                force_refresh=force_refresh
+                force_refresh=st.session_state.audio_refreshed,
+                wait=False
             )
-            if generated_audio:
-                st.session_state.current_audio_file = generated_audio
-                st.session_state.audio_generated = True
-                st.session_state.audio_refreshed = False
-                st.session_state.last_voice_settings = current_settings  # 更新上次设置
-            else:
-                st.warning("音频生成失败，请重试")
+            st.session_state.current_audio_file = generated_audio
+            st.session_state.audio_generated = generated_audio is not None
+            st.session_state.audio_refreshed = False
+            st.session_state.last_voice_settings = current_settings  # 更新上次设置
         
         col1, col2 = st.columns([1, 1])
         
@@ -308,14 +374,10 @@ def flashcard_mode():
                 audio_file = st.session_state.current_audio_file
                 
                 if audio_file and audio_file.exists():
-                    audio_base64 = get_audio_base64(audio_file)
-                    if audio_base64:
-                        st.markdown(f"""
-                        <audio controls autoplay id="word_audio">
-                            <source src="data:audio/wav;base64,{audio_base64}" type="audio/wav">
-                            您的浏览器不支持音频元素。
-                        </audio>
-                        """, unsafe_allow_html=True)
+                    audio_bytes = get_audio_bytes(audio_file)
+                    if audio_bytes:
+                        # st.audio 按内容哈希生成媒体地址，浏览器可以直接缓存，不再内联 base64
+                        st.audio(audio_bytes, format="audio/wav", autoplay=True)
                         
                         # 添加刷新音频按钮
                         if st.button("🔄 刷新音频", key="btn_refresh_audio", 
@@ -324,8 +386,15 @@ def flashcard_mode():
                             st.rerun()
                     else:
                         st.warning("无法加载音频文件")
+                elif not tts_available():
+                    st.caption(f"🔇 静音模式：{detect_tts()['error']}")
+                elif get_audio_prefetcher().is_pending(get_audio_key(word)):
+                    # 后台仍在生成，先显示占位提示
+                    st.info("🔊 发音生成中，请稍候…")
+                    if st.button("🔄 检查音频", key="btn_check_audio"):
+                        st.rerun()
                 else:
-                    st.warning("音频文件未生成")
+                    st.warning("音频生成失败，请重试")
                 
                 st.success(f"**中文释义**: {word['zh']}")
                 st.info(f"**词性**: {word['type']}")
@@ -360,24 +429,21 @@ def flashcard_mode():
                 get_new_word()
                 st.rerun()
             
-            st.info("提示: 单词卡片操作不会影响单词出现频率")
+            st.info("提示: 「认识」「不认识」会影响单词的下次复习时间")
+
+# 获取当前筛选结果对应的干扰项索引：索引缓存在词库或筛选视图上，相同筛选条件的会话共用一份
+def get_distractor_index():
+    return st.session_state.filtered_words.distractor_index()
 
 # 生成选择题选项
 def generate_quiz_options():
     if st.session_state.current_word and not st.session_state.quiz_options:
-        word = st.session_state.current_word
-        options = [word['zh']]
-        
-        while len(options) < 4 and len(options) < len(st.session_state.filtered_words):
-            random_word = random.choice(st.session_state.filtered_words)
-            if random_word['zh'] not in options and random_word['id'] != word['id']:
-                options.append(random_word['zh'])
-        
-        random.shuffle(options)
+        options, answer = get_distractor_index().options_for(st.session_state.current_word)
         st.session_state.quiz_options = options
-        st.session_state.quiz_answer = word['zh']
+        st.session_state.quiz_answer = answer
 
 # 选择题模式
+@profiler.timed("quiz_mode")
 def quiz_mode():
     if not st.session_state.current_word and st.session_state.filtered_words:
         get_new_word()
@@ -408,6 +474,7 @@ def quiz_mode():
                 st.rerun()
 
 # 拼写测试模式
+@profiler.timed("spelling_mode")
 def spelling_mode():
     if not st.session_state.current_word and st.session_state.filtered_words:
         get_new_word()
@@ -445,7 +512,120 @@ def spelling_mode():
                     get_new_word()
                     st.rerun()
 
+# 开始一轮考试：一次抽取不重复的单词并生成全部选项
+def start_exam(count, kind, minutes):
+    words = get_word_sampler().sample_distinct(count)
+    st.session_state.exam_round += 1
+    st.session_state.exam = {
+        "round": st.session_state.exam_round,
+        "user": st.session_state.current_user,
+        "kind": kind,
+        "words": words,
+        "options": get_distractor_index().build_round(words) if kind == "quiz" else None,
+        "started": time.time(),
+        "limit": minutes * 60,
+        "result": None,
+    }
+
+# 评分并一次性记录整轮答题（超时提交只评分，不记入学习统计）
+def grade_exam(exam, answers, persist=True):
+    elapsed = time.time() - exam["started"]
+    results = []
+    for index, word in enumerate(exam["words"]):
+        given = answers[index]
+        if exam["kind"] == "quiz":
+            expected = exam["options"][index][1]
+            is_correct = given == expected
+        else:
+            expected = word["en"]
+            given = (given or "").strip()
+            is_correct = given.lower() == expected.lower()
+        results.append((word, given, expected, is_correct))
+    
+    if persist:
+        record_progress(exam["user"], [("answer", str(word["id"]), is_correct)
+                                       for word, _, _, is_correct in results])
+        st.session_state.user_data = load_user_data(exam["user"])
+    exam["result"] = {"results": results, "elapsed": elapsed}
+
+# 考试模式：整轮题目放在一个表单里，提交前作答不会触发重新运行，提交时统一评分和保存
+@profiler.timed("exam_mode")
+def exam_mode():
+    exam = st.session_state.exam
+    if exam is not None and exam["user"] != st.session_state.current_user:
+        exam = st.session_state.exam = None
+    
+    st.subheader("考试模式")
+    if exam is None:
+        with st.form("form_exam_settings"):
+            col_count, col_kind, col_minutes = st.columns(3)
+            with col_count:
+                count = st.selectbox("题目数量", EXAM_SIZES, index=1, key="select_exam_size")
+            with col_kind:
+                kind_name = st.radio("题型", ["选择题", "拼写"], key="radio_exam_kind", horizontal=True)
+            with col_minutes:
+                minutes = st.number_input("限时 (分钟，0 为不限时)", min_value=0, max_value=120, value=0,
+                                          step=1, key="input_exam_minutes")
+            if st.form_submit_button("开始考试", use_container_width=True):
+                start_exam(count, "quiz" if kind_name == "选择题" else "spelling", minutes)
+                st.rerun()
+        return
+    
+    result = exam["result"]
+    if result is None:
+        total = len(exam["words"])
+        if exam["limit"]:
+            deadline = time.localtime(exam["started"] + exam["limit"])
+            st.caption(f"共 {total} 题，请在 {time.strftime('%H:%M:%S', deadline)} 前提交，超时提交不计入学习统计")
+        else:
+            st.caption(f"共 {total} 题")
+        
+        prefix = f"exam_{exam['round']}"
+        with st.form(f"form_{prefix}"):
+            answers = []
+            for index, word in enumerate(exam["words"]):
+                if exam["kind"] == "quiz":
+                    options = exam["options"][index][0]
+                    answers.append(st.radio(f"{index + 1}. **{word['en']}**", options, index=None,
+                                            key=f"radio_{prefix}_{index}"))
+                else:
+                    answers.append(st.text_input(f"{index + 1}. {word['zh']} ({word['type']})",
+                                                 key=f"input_{prefix}_{index}"))
+            submitted = st.form_submit_button("交卷", type="primary", use_container_width=True)
+        
+        if st.button("放弃本轮", key=f"btn_cancel_{prefix}"):
+            st.session_state.exam = None
+            st.rerun()
+        
+        if submitted:
+            in_time = not exam["limit"] or time.time() - exam["started"] <= exam["limit"]
+            grade_exam(exam, answers, persist=in_time)
+            st.rerun()
+        return
+    
+    results = result["results"]
+    correct = sum(1 for *_, is_correct in results if is_correct)
+    col_score, col_rate, col_time = st.columns(3)
+    col_score.metric("得分", f"{correct}/{len(results)}")
+    col_rate.metric("正确率", f"{correct / len(results):.0%}" if results else "-")
+    col_time.metric("用时", f"{result['elapsed']:.0f} 秒")
+    if exam["limit"] and result["elapsed"] > exam["limit"]:
+        st.warning("超过限时，本轮成绩没有计入学习统计")
+    
+    wrong = [{"单词": word["en"], "释义": word["zh"], "你的答案": given or "", "正确答案": expected}
+             for word, given, expected, is_correct in results if not is_correct]
+    if wrong:
+        st.write("答错的题目:")
+        st.dataframe(wrong, hide_index=True, use_container_width=True)
+    else:
+        st.success("全部正确！")
+    
+    if st.button("再来一轮", key="btn_exam_again", use_container_width=True):
+        st.session_state.exam = None
+        st.rerun()
+
 # 语音设置侧边栏
+@profiler.timed("voice_settings")
 def voice_settings():
     with st.sidebar.expander("🔊 语音设置", expanded=True):
         # 语音性别选择
@@ -461,26 +641,18 @@ def voice_settings():
                          help="数值越大语速越快")
         st.session_state.voice_speed = speed
         
+        if not tts_available():
+            st.caption(f"🔇 语音不可用，已切换为静音模式：{detect_tts()['error']}")
+        
+        cache_stats = get_audio_cache(AUDIO_DIR, AUDIO_CACHE_MAX_BYTES).stats()
+        st.caption(f"音频缓存: {cache_stats['files']} 个文件，"
+                   f"{cache_stats['bytes'] / 1024 / 1024:.1f} / {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        
         # 清除音频缓存按钮
         if st.button("清除音频缓存", key="btn_clear_audio_cache"):
-            deleted_files = 0
-            for file in AUDIO_DIR.glob("*.wav"):
-                try:
-                    # 尝试删除文件，如果失败则跳过
-                    for attempt in range(3):
-                        try:
-                            file.unlink()
-                            deleted_files += 1
-                            break
-                        except PermissionError:
-                            if attempt < 2:
-                                time.sleep(0.5)  # 等待0.5秒后重试
-                            else:
-                                st.warning(f"无法删除文件，可能是文件正在使用中: {file.name}")
-                except Exception as e:
-                    st.warning(f"删除文件失败: {e}")
-            
-            st.toast(f"已删除 {deleted_files} 个音频缓存文件！", icon="✅")
+            # 索引立即清空，文件由后台线程删除
+            deleted_files = get_audio_cache(AUDIO_DIR, AUDIO_CACHE_MAX_BYTES).clear()
+            st.toast(f"已清除 {deleted_files} 个音频缓存文件！", icon="✅")
             
             # 如果当前有单词且显示答案，重新生成音频
             if st.session_state.show_answer and st.session_state.current_word:
@@ -488,6 +660,7 @@ def voice_settings():
                 st.rerun()
 
 # 用户管理界面
+@profiler.timed("user_management")
 def user_management():
     with st.sidebar.expander("👤 用户管理", expanded=True):
         all_users = get_all_users()
@@ -499,24 +672,24 @@ def user_management():
                 if new_user in all_users:
                     st.error("用户名已存在")
                 elif new_user:
-                    save_user_data(new_user, {"known_words": {}, "word_stats": {}})
+                    get_registry().create(new_user)
                     st.toast(f"用户 {new_user} 创建成功！", icon="✅")
                     st.session_state.current_user = new_user
                     st.session_state.user_data = load_user_data(new_user)
+                    st.session_state.word_sampler = None
                     st.rerun()
         
         with col2:
             if st.button("删除当前用户", key="btn_delete_user", use_container_width=True) and st.session_state.current_user:
-                user_file = USER_DATA_DIR / f"{st.session_state.current_user}.json"
-                if user_file.exists():
-                    try:
-                        os.remove(user_file)
-                        st.toast(f"用户 {st.session_state.current_user} 已删除", icon="✅")
-                        st.session_state.current_user = None
-                        st.session_state.user_data = {}
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"删除用户失败: {e}")
+                try:
+                    get_registry().delete(st.session_state.current_user)
+                except Exception as e:
+                    st.error(f"删除用户失败: {e}")
+                else:
+                    st.toast(f"用户 {st.session_state.current_user} 已删除", icon="✅")
+                    st.session_state.current_user = None
+                    st.session_state.user_data = {}
+                    st.rerun()
         
         selected_user = st.selectbox(
             "选择用户",
@@ -528,31 +701,58 @@ def user_management():
         if selected_user and selected_user != st.session_state.current_user:
             st.session_state.current_user = selected_user
             st.session_state.user_data = load_user_data(selected_user)
+            st.session_state.word_sampler = None
             st.rerun()
         
         if st.session_state.current_user:
             st.info(f"当前用户: {st.session_state.current_user}")
             
             if st.button("重置学习进度", key="btn_reset_progress", use_container_width=True):
-                st.session_state.user_data = {"known_words": {}, "word_stats": {}}
-                save_user_data(st.session_state.current_user, st.session_state.user_data)
+                save_user_data(st.session_state.current_user, {"known_words": {}, "word_stats": {}})
+                st.session_state.user_data = load_user_data(st.session_state.current_user)
+                st.session_state.word_sampler = None
                 st.toast("学习进度已重置！", icon="✅")
                 st.rerun()
 
 # 筛选选项侧边栏
-def filter_sidebar():
+@profiler.timed("filter_sidebar")
+def filter_sidebar(books, book):
     if st.session_state.word_list:
-        # 获取所有单元（转换为字符串）
-        all_units = sorted(set(str(word.get("unit", "")) for word in st.session_state.word_list))
-        # 获取所有词性
-        all_types = sorted(set(word.get("type", "") for word in st.session_state.word_list))
+        # 单元、词性列表由词库预先计算；词书模式下读取词书目录，不需要加载全部分片
+        if book is not None:
+            all_units = book.units
+            all_types = book.types
+            unit_label = lambda unit: f"{unit} ({book.entries[unit]['count']})"
+        else:
+            all_units = st.session_state.word_list.units
+            all_types = st.session_state.word_list.types
+            unit_label = str
         
         with st.sidebar.expander("🔍 筛选选项", expanded=True):
+            # 词书选择器（切换词书时清空筛选条件和已抽取的单词）
+            if book is not None:
+                book_ids = list(books)
+                selected_book = st.selectbox(
+                    "选择词书",
+                    options=book_ids,
+                    index=book_ids.index(book.id),
+                    format_func=lambda book_id: f"{books[book_id].title} ({books[book_id].count})",
+                    key="select_book"
+                )
+                if selected_book != book.id:
+                    st.session_state.book = selected_book
+                    st.session_state.unit_filter = []
+                    st.session_state.type_filter = []
+                    st.session_state.current_word = None
+                    st.session_state.upcoming_words = []
+                    st.rerun()
+            
             # 单元筛选器
             selected_units = st.multiselect(
                 "选择单元",
                 options=all_units,
                 default=st.session_state.unit_filter,
+                format_func=unit_label,
                 key="multiselect_unit_filter"
             )
             st.session_state.unit_filter = selected_units
@@ -574,18 +774,24 @@ def filter_sidebar():
             )
             st.session_state.review_mode = review_mode
         
+        # 词书模式下单元选择可能变化，先加载对应分片再筛选
+        if book is not None:
+            load_word_data(book)
+        
         # 应用筛选条件
         apply_filters()
         
         st.sidebar.markdown(f"📊 当前单词总数: {len(st.session_state.filtered_words)}")
 
 # 学习模式选择
+@profiler.timed("study_mode_selector")
 def study_mode_selector():
     if st.session_state.word_list:
         mode_mapping = {
             "单词卡片": "flashcard",
             "选择题": "quiz",
-            "拼写测试": "spelling"
+            "拼写测试": "spelling",
+            "考试": "exam"
         }
         
         mode_names = list(mode_mapping.keys())
@@ -600,46 +806,90 @@ def study_mode_selector():
         
         st.session_state.study_mode = mode_mapping[selected_mode]
 
-# 统计信息侧边栏
-def stats_sidebar():
+# 统计信息侧边栏（读取增量维护的汇总数据，与已练习的单词数量无关）
+@profiler.timed("stats_sidebar")
+def stats_sidebar(book):
     if st.session_state.word_list and st.session_state.current_user:
         with st.sidebar.expander("📈 学习统计", expanded=False):
-            total_words = len(st.session_state.word_list)
-            known_count = len(st.session_state.user_data.get("known_words", {}))
+            aggregates = get_registry().get(st.session_state.current_user).aggregates
+            total_words = book.count if book is not None else len(st.session_state.word_list)
+            known_count = aggregates.mastered
             progress = known_count / total_words if total_words > 0 else 0
             
             st.write(f"总单词数: {total_words}")
             st.write(f"已掌握: {known_count}")
             st.progress(min(1.0, progress))
             
+            total_attempts = aggregates.total_correct + aggregates.total_wrong
+            if total_attempts > 0:
+                st.write(f"已练习: {aggregates.attempted} 个单词，正确率 {aggregates.total_correct / total_attempts:.0%}")
+            
             word_stats = st.session_state.user_data.get("word_stats", {})
-            if word_stats:
-                hardest_words = []
-                for word_id, stats in word_stats.items():
-                    word = next((w for w in st.session_state.word_list if str(w["id"]) == word_id), None)
-                    if word:
-                        total_attempts = stats["correct"] + stats["wrong"]
-                        if total_attempts > 0:
-                            error_rate = stats["wrong"] / total_attempts
-                            hardest_words.append((word, error_rate, stats))
-                
-                if hardest_words:
-                    hardest_words.sort(key=lambda x: x[1], reverse=True)
-                    st.write("最难单词 (按错误率排序):")
-                    for word, error_rate, stats in hardest_words[:5]:
-                        st.write(f"- **{word['en']}** ({word['zh']}): 错误率 {error_rate:.0%} (✓{stats['correct']} ✗{stats['wrong']})")
+            hardest_words = []
+            for word_id, error_rate in aggregates.iter_hardest():
+                word = lookup_word(book, word_id)
+                if word:
+                    hardest_words.append((word, error_rate, word_stats[word_id]))
+                    if len(hardest_words) == 5:
+                        break
+            
+            if hardest_words:
+                st.write("最难单词 (按错误率排序):")
+                for word, error_rate, stats in hardest_words:
+                    st.write(f"- **{word['en']}** ({word['zh']}): 错误率 {error_rate:.0%} (✓{stats['correct']} ✗{stats['wrong']})")
+
+# 在当前筛选结果中搜索（英文前缀 / 中文 n-gram），命中的位置再按筛选视图二分过滤
+def search_filtered_words(query):
+    vocab = st.session_state.word_list
+    filtered = st.session_state.filtered_words
+    if not query.strip():
+        return filtered
+    positions = vocab.search(query)
+    if filtered is not vocab:
+        positions = [pos for pos in positions if filtered.has_position(pos)]
+    return [vocab[pos] for pos in positions]
 
-# 单词列表展示
+# 单词列表展示（分页，只为当前页的单词创建控件）
+@profiler.timed("word_list_display")
 def word_list_display():
     if st.session_state.word_list and st.sidebar.checkbox("显示单词列表", key="checkbox_show_word_list"):
         st.subheader("单词列表")
         
+        col_search, col_size, col_page = st.columns([3, 1, 1])
+        with col_search:
+            query = st.text_input("搜索单词", key="input_word_search",
+                                  placeholder="输入英文前缀或中文释义")
+        with col_size:
+            page_size = st.selectbox("每页数量", WORD_LIST_PAGE_SIZES, key="select_word_page_size")
+        
+        words = search_filtered_words(query)
+        page_count = max(1, (len(words) + page_size - 1) // page_size)
+        
+        # 搜索条件或每页数量变化时回到第一页
+        list_key = (query, page_size, id(st.session_state.filtered_words))
+        if st.session_state.get("word_list_key") != list_key:
+            st.session_state.word_list_key = list_key
+            st.session_state.input_word_page = 1
+        if st.session_state.get("input_word_page", 1) > page_count:
+            st.session_state.input_word_page = page_count
+        
+        with col_page:
+            page = st.number_input("页码", min_value=1, max_value=page_count, step=1, key="input_word_page")
+        
+        start = (page - 1) * page_size
+        page_words = words[start:start + page_size]
+        st.caption(f"共 {len(words)} 个单词，第 {page}/{page_count} 页")
+        
+        # 已掌握、答题统计只查询当前页的单词
+        known_words = st.session_state.user_data.get("known_words", {})
+        word_stats = st.session_state.user_data.get("word_stats", {})
+        
         cols = st.columns(3)
-        for idx, word in enumerate(st.session_state.filtered_words):
+        for idx, word in enumerate(page_words):
             with cols[idx % 3]:
                 word_id = str(word["id"])
-                is_known = word_id in st.session_state.user_data.get("known_words", {})
-                stats = st.session_state.user_data.get("word_stats", {}).get(word_id, {"correct": 0, "wrong": 0})
+                is_known = word_id in known_words
+                stats = word_stats.get(word_id, {"correct": 0, "wrong": 0})
                 
                 with st.expander(f"{word['en']} - {word['zh']} {'✅' if is_known else ''}", key=f"expander_{word['id']}"):
                     st.write(f"**词性**: {word['type']}")
@@ -647,18 +897,15 @@ def word_list_display():
                     st.write(f"**正确**: {stats['correct']} 次")
                     st.write(f"**错误**: {stats['wrong']} 次")
                     
-                    if st.button("播放发音", key=f"btn_play_{word['id']}", use_container_width=True):
+                    if st.button("播放发音", key=f"btn_play_{word['id']}", use_container_width=True,
+                                 disabled=not tts_available()):
                         audio_file = generate_audio(
                             word
                         )
                         if audio_file:
-                            audio_base64 = get_audio_base64(audio_file)
-                            if audio_base64:
-                                st.markdown(f"""
-                                <audio controls autoplay>
-                                    <source src="data:audio/wav;base64,{audio_base64}" type="audio/wav">
-                                </audio>
-                                """, unsafe_allow_html=True)
+                            audio_bytes = get_audio_bytes(audio_file)
+                            if audio_bytes:
+                                st.audio(audio_bytes, format="audio/wav", autoplay=True)
                     
                     if st.button(
                         "✅ 已掌握" if is_known else "标记为已掌握",
@@ -666,23 +913,108 @@ def word_list_display():
                         type="primary" if is_known else "secondary",
                         use_container_width=True
                     ):
-                        if is_known:
-                            mark_word(False)
-                        else:
-                            mark_word(True)
+                        mark_word(not is_known, word)
                         st.rerun()
 
+# 班级统计：汇总所有学习者的掌握情况、单元正确率和全班最难单词
+@profiler.timed("teacher_dashboard")
+def teacher_dashboard(book):
+    # 只有登录的老师账号可以查看
+    if st.session_state.current_user not in TEACHER_USERS:
+        return
+    if not st.sidebar.checkbox("👩‍🏫 班级统计", key="checkbox_teacher_dashboard"):
+        return
+    rollup = get_class_rollup(USER_DATA_DIR, PROGRESS_BACKEND)
+    st.subheader("👩‍🏫 班级统计")
+    
+    refresh = st.button("刷新", key="btn_refresh_dashboard")
+    last = rollup.last_refresh
+    if last is None or refresh:
+        rollup.refresh()
+    elif time.time() - last["at"] >= DASHBOARD_REFRESH_SECONDS:
+        # 其他会话正在刷新时不等待，直接显示上一次的结果
+        rollup.refresh(blocking=False)
+    last = rollup.last_refresh
+    if last:
+        st.caption(f"更新于 {time.strftime('%H:%M:%S', time.localtime(last['at']))}，"
+                   f"重新读取 {last['changed']} 个学习者，用时 {last['seconds'] * 1000:.0f} ms")
+    
+    overview = rollup.overview()
+    if not overview["learners"]:
+        st.info("还没有学习者的进度记录")
+        return
+    col_learners, col_mastered, col_answers, col_accuracy = st.columns(4)
+    col_learners.metric("学习者", overview["learners"])
+    col_mastered.metric("平均掌握", f"{overview['average_mastered']:.1f}")
+    col_answers.metric("答题总数", overview["answers"])
+    col_accuracy.metric("正确率", f"{overview['accuracy']:.0%}" if overview["accuracy"] is not None else "-")
+    
+    if st.session_state.word_list:
+        units = rollup.unit_rollup(word_unit_lookup(book))
+        if units:
+            st.write("各单元情况:")
+            st.dataframe([
+                {"单元": unit, "正确": correct, "错误": wrong,
+                 "错误率": round(wrong / (correct + wrong), 3) if correct + wrong else None, "掌握人次": mastered}
+                for unit, (correct, wrong, mastered) in sorted(units.items())
+            ], hide_index=True, use_container_width=True)
+    
+        hardest = []
+        for word_id, correct, wrong, learners, mastered in rollup.hardest_words(20):
+            word = lookup_word(book, word_id)
+            if word:
+                hardest.append({"单词": word["en"], "释义": word["zh"], "单元": word["unit"],
+                                "错误率": round(wrong / (correct + wrong), 3), "✓": correct, "✗": wrong,
+                                "练习人数": learners, "掌握人数": mastered})
+        if hardest:
+            st.write("全班最难单词 (按错误率排序):")
+            st.dataframe(hardest, hide_index=True, use_container_width=True)
+    
+    st.write("学习者:")
+    st.dataframe([
+        {"学习者": row["learner"], "已掌握": row["mastered"], "已练习": row["practised"], "正确率": row["accuracy"]}
+        for row in rollup.learners()
+    ], hide_index=True, use_container_width=True)
+
+# 当前会话是否开启性能分析：环境变量 WORD_APP_PROFILE=1 对所有会话开启，网址参数 ?profile=1 只对当前会话开启
+def profiling_enabled():
+    return profiler.enabled or st.session_state.get("profile_session", False)
+
+# 性能分析面板（开启分析时显示）：各阶段耗时分布和上一次运行的明细
+def profiling_panel():
+    if not profiling_enabled():
+        return
+    with st.sidebar.expander("🛠️ 性能分析", expanded=False):
+        last_run = st.session_state.get("last_profile")
+        if last_run:
+            st.write("上一次运行:")
+            st.dataframe([{"stage": name, "ms": round(seconds * 1000, 2)} for name, seconds in last_run],
+                         hide_index=True, use_container_width=True)
+        
+        rows = profiler.summary()
+        if rows:
+            st.write("各阶段耗时 (最近记录):")
+            st.dataframe([{k: v for k, v in row.items() if k != "histogram"} for row in rows],
+                         hide_index=True, use_container_width=True)
+        
+        st.download_button("导出 JSON", profiler.to_json(startup=startup_report()),
+                           file_name="profile.json", mime="application/json", key="btn_download_profile")
+        if st.button("清空统计", key="btn_reset_profile"):
+            profiler.reset()
+            st.rerun()
+
 # 主界面
 def main():
-    load_word_data()
+    books, book = current_book()
+    load_word_data(book)
     
     user_management()
     voice_settings()
     
     if st.session_state.current_user:
-        filter_sidebar()
+        filter_sidebar(books, book)
         study_mode_selector()
-        stats_sidebar()
+        stats_sidebar(book)
         
         if not st.session_state.word_loaded:
             st.info("请确保main.json文件存在并格式正确")
@@ -709,8 +1041,32 @@ def main():
                     quiz_mode()
                 elif st.session_state.study_mode == "spelling":
                     spelling_mode()
+                elif st.session_state.study_mode == "exam":
+                    exam_mode()
         
         word_list_display()
+        teacher_dashboard(book)
+    
+    profiling_panel()
+    
+    # 启动耗时（第一次运行即冷启动）
+    report = startup_report()
+    if report["first_run_seconds"] is not None:
+        st.sidebar.caption(f"⏱️ 冷启动 {report['first_run_seconds']:.2f}s · 已运行 {report['runs']} 次")
 
 if __name__ == "__main__":
-    main()
+    # 网址参数 ?profile=1 / ?profile=0 只开启或关闭当前会话的性能分析，不影响其他会话
+    profile_param = st.query_params.get("profile")
+    if profile_param in ("0", "1"):
+        st.session_state.profile_session = profile_param == "1"
+    profiler.begin_run(profiling_enabled())
+    try:
+        main()
+    finally:
+        run_seconds = time.perf_counter() - RUN_STARTED
+        record_run(run_seconds)
+        if profiling_enabled():
+            profiler.record("rerun", run_seconds)
+            st.session_state.last_profile = profiler.end_run()
+        else:
+            profiler.end_run()
@@ -0,0 +1,40 @@
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+import dashboard
+from progress_store import get_progress_backend
+
+APP_FILE = Path(__file__).resolve().parent.parent / "streamlit_app.py"
+
+
+# 在 Streamlit 中主模块是应用脚本：进程池的工作进程不能重新执行它（导入时会创建 audio 目录等）
+def test_pool_workers_do_not_import_app(tmp_path, monkeypatch):
+    pytest.importorskip("streamlit")
+    monkeypatch.chdir(tmp_path)
+    app_main = types.ModuleType("__main__")
+    app_main.__file__ = str(APP_FILE)
+    monkeypatch.setitem(sys.modules, "__main__", app_main)
+    monkeypatch.setattr(dashboard, "PARALLEL_THRESHOLD", 1)
+
+    backend = get_progress_backend(tmp_path / "users", "sqlite")
+    for i in range(8):
+        backend.create(f"u{i}")
+        backend.apply(f"u{i}", [("answer", str(j), j % 3 == 0) for j in range(1, 20)] + [("known", "1", True)])
+
+    pooled = dashboard.ClassRollup(tmp_path / "users", "sqlite", max_workers=2)
+    inline = dashboard.ClassRollup(tmp_path / "users", "sqlite", max_workers=1)
+    try:
+        pooled.refresh()
+        assert pooled.executor is not None
+    finally:
+        if pooled.executor is not None:
+            pooled.executor.shutdown()
+    inline.refresh()
+
+    assert not (tmp_path / "audio").exists()
+    assert pooled.word_totals == inline.word_totals
+    assert pooled.overview() == inline.overview()
+    assert pooled.overview()["learners"] == 8
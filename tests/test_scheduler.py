@@ -0,0 +1,68 @@
+import scheduler
+from progress_store import UserProgress
+from scheduler import DAY, DueQueue
+from stats_table import StatsTable
+
+NOW = 1_700_000_000.0
+
+
+def schedule_of(progress, word_id):
+    stats = progress.data["word_stats"][word_id]
+    return stats["reps"], stats["interval"], stats["ease"], stats["due"]
+
+
+# 同一张卡片连续点击「认识」：只有第一次算一次复习
+def test_repeated_known_marks_do_not_advance_schedule():
+    progress = UserProgress("amy", {})
+    progress.record([("known", "5", True)], now=NOW)
+    first = schedule_of(progress, "5")
+    for i in range(3):
+        progress.record([("known", "5", True)], now=NOW + i + 1)
+    assert schedule_of(progress, "5") == first
+    assert first[:2] == (1, 1.0)
+    assert progress.data["known_words"] == {"5": True}
+
+
+# 没到期时答对只记录次数，到期后答对才推进间隔
+def test_correct_answers_before_due_only_count():
+    progress = UserProgress("amy", {})
+    progress.record([("answer", "7", True)], now=NOW)
+    first = schedule_of(progress, "7")
+    progress.record([("answer", "7", True), ("answer", "7", True)], now=NOW + 60)
+    stats = progress.data["word_stats"]["7"]
+    assert (stats["correct"], stats["wrong"]) == (3, 0)
+    assert schedule_of(progress, "7") == first
+
+    progress.record([("answer", "7", True)], now=first[3] + 1)
+    reps, interval, _, due = schedule_of(progress, "7")
+    assert (reps, interval) == (2, 6.0)
+    assert due == first[3] + 1 + 6 * DAY
+
+
+# 答错让已记住的单词重新学习，重新学习期间再答错不会继续降低难度系数
+def test_wrong_answers_while_relearning_do_not_compound():
+    progress = UserProgress("amy", {})
+    progress.record([("answer", "9", True)], now=NOW)
+    progress.record([("answer", "9", False)], now=NOW + 60)
+    lapsed = schedule_of(progress, "9")
+    assert lapsed[:2] == (0, 0.0)
+    progress.record([("answer", "9", False)], now=NOW + 120)
+    assert schedule_of(progress, "9") == lapsed
+    assert progress.data["word_stats"]["9"]["wrong"] == 2
+
+
+# 旧数据没有调度信息：错误多的先出队，不按 id 的字符串顺序
+def test_legacy_words_leave_queue_by_error_weight():
+    words = [{"id": i} for i in range(1, 121)]
+    stats = {str(i): {"correct": 1, "wrong": 0} for i in range(1, 121)}
+    stats["120"] = {"correct": 0, "wrong": 5}
+    stats["57"] = {"correct": 0, "wrong": 3}
+    for user_stats in (stats, StatsTable(stats)):
+        queue = DueQueue(words, user_stats)
+        order = [str(queue.pop_due(now=NOW)["id"]) for _ in range(len(words))]
+        assert order[:2] == ["120", "57"]
+        rest = order[2:]
+        assert rest != sorted(rest) and set(rest) == set(stats) - {"120", "57"}
+    # 按列存储的批量计算与逐个计算一致
+    ids = list(stats)
+    assert StatsTable(stats).due_times_for(ids).tolist() == [scheduler.due_time(i, stats[i]) for i in ids]
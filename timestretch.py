@@ -0,0 +1,72 @@
+import io
+import wave
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# WSOLA 变速不变调：按合成步长取帧，在名义位置附近搜索与上一帧自然延续最相似的位置再加窗叠加
+FRAME_SECONDS = 0.04  # 帧长
+SEARCH_SECONDS = 0.01  # 相似度搜索范围（±）
+
+
+# 对 PCM 采样做时间伸缩，factor > 1 变快（时长变为 1/factor），音高不变
+# samples 形状为 (采样数, 声道数)
+def wsola(samples, factor, sample_rate):
+    length, channels = samples.shape
+    if length == 0 or factor == 1:
+        return samples
+    frame = max(64, int(sample_rate * FRAME_SECONDS)) // 2 * 2
+    hop = frame // 2
+    delta = max(1, int(sample_rate * SEARCH_SECONDS))
+    window = np.hanning(frame)
+
+    out_length = int(round(length / factor))
+    frames = out_length // hop + 1
+    pad = delta + frame
+    padded = np.pad(samples, ((pad, pad + frame + int(hop * factor) + 1), (0, 0)))
+    mono = padded.mean(axis=1)
+
+    output = np.zeros((frames * hop + frame, channels))
+    weight = np.zeros(frames * hop + frame)
+    previous = None
+    for k in range(frames):
+        nominal = pad + int(round(k * hop * factor))
+        if previous is None:
+            position = nominal
+        else:
+            # 上一帧在原始信号中的自然延续作为模板，候选位置一次性做内积
+            template = mono[previous + hop:previous + hop + frame]
+            start = nominal - delta
+            candidates = sliding_window_view(mono[start:start + 2 * delta + frame], frame)
+            position = start + int(np.argmax(candidates @ template))
+        output[k * hop:k * hop + frame] += padded[position:position + frame] * window[:, None]
+        weight[k * hop:k * hop + frame] += window
+        previous = position
+
+    # 按窗函数的叠加权重归一化（开头权重接近 0 的几个采样保持原样）
+    nonzero = weight > 1e-3
+    output[nonzero] /= weight[nonzero, None]
+    return output[:out_length]
+
+
+# 对 16 位 PCM 的 WAV 数据变速，返回新的 WAV 数据；其他格式抛出 ValueError
+def stretch_wav(data, factor):
+    with wave.open(io.BytesIO(data), "rb") as reader:
+        params = reader.getparams()
+        raw = reader.readframes(params.nframes)
+    if params.sampwidth != 2:
+        raise ValueError(f"unsupported sample width: {params.sampwidth}")
+
+    channels = params.nchannels
+    usable = len(raw) // (2 * channels) * 2 * channels
+    samples = np.frombuffer(raw[:usable], dtype="<i2").reshape(-1, channels).astype(np.float64)
+    stretched = wsola(samples, factor, params.framerate)
+    pcm = np.clip(np.round(stretched), -32768, 32767).astype("<i2")
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(params.framerate)
+        writer.writeframes(pcm.tobytes())
+    return buffer.getvalue()
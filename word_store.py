@@ -0,0 +1,270 @@
+import bisect
+import json
+import re
+import threading
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from types import MappingProxyType
+
+from distractors import DistractorIndex
+from profiling import profiler
+
+# 进程级共享词库：所有会话共用同一份只读数据，只有文件修改时间变化时才重新加载
+_vocab_lock = threading.Lock()
+_vocab_cache = {}
+
+MAX_CACHED_VIEWS = 64  # 每个词库缓存的单元/词性筛选视图数量
+
+
+# 判断查询词是否包含中文
+_CJK_RE = re.compile(r"[\u3400-\u9fff]")
+
+
+# 单词搜索索引：英文按前缀（整词及词组中的每个单词），中文按单字/双字 n-gram
+class SearchIndex:
+    def __init__(self, words):
+        prefix_keys = []
+        grams = {}
+        for pos, word in enumerate(words):
+            en = str(word.get("en", "")).lower()
+            tokens = {en} | set(en.split())
+            for token in tokens:
+                if token:
+                    prefix_keys.append((token, pos))
+
+            zh = str(word.get("zh", ""))
+            for i, char in enumerate(zh):
+                grams.setdefault(char, set()).add(pos)
+                if i + 1 < len(zh):
+                    grams.setdefault(zh[i:i + 2], set()).add(pos)
+
+        prefix_keys.sort()
+        self.prefix_keys = prefix_keys
+        self.grams = grams
+        self.words = words
+
+    def _search_en(self, query):
+        query = query.lower()
+        start = bisect.bisect_left(self.prefix_keys, (query,))
+        end = bisect.bisect_left(self.prefix_keys, (query + "\uffff",))
+        return {pos for _, pos in self.prefix_keys[start:end]}
+
+    def _search_zh(self, query):
+        if len(query) == 1:
+            return set(self.grams.get(query, ()))
+        # 双字 n-gram 求交集得到候选，再确认整个查询串确实出现
+        candidates = None
+        for i in range(len(query) - 1):
+            positions = self.grams.get(query[i:i + 2])
+            if not positions:
+                return set()
+            candidates = set(positions) if candidates is None else candidates & positions
+        return {pos for pos in candidates if query in self.words[pos]["zh"]}
+
+    # 返回匹配单词的位置（升序）
+    def search(self, query):
+        query = query.strip()
+        if not query:
+            return list(range(len(self.words)))
+        if _CJK_RE.search(query):
+            return sorted(self._search_zh(query))
+        return sorted(self._search_en(query))
+
+
+# 词库的筛选视图：只保存单词在词库中的位置（升序的紧凑整数数组），按需取出单词
+class WordView(Sequence):
+    def __init__(self, vocab, positions):
+        self.vocab = vocab
+        self.positions = positions if isinstance(positions, array) else array("I", positions)
+        self._distractor_index = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.vocab[pos] for pos in self.positions[index]]
+        return self.vocab[self.positions[index]]
+
+    def __iter__(self):
+        vocab = self.vocab
+        return (vocab[pos] for pos in self.positions)
+
+    # 词库中的某个位置是否在视图中，O(log n)
+    def has_position(self, pos):
+        index = bisect.bisect_left(self.positions, pos)
+        return index < len(self.positions) and self.positions[index] == pos
+
+    # 选择题干扰项索引第一次使用时才构建；共享视图上的索引所有会话共用
+    def distractor_index(self):
+        if self._distractor_index is None:
+            self._distractor_index = DistractorIndex(self)
+        return self._distractor_index
+
+
+# 只读词库，附带 id、单元、词性索引
+class Vocabulary:
+    def __init__(self, words, source=None, mtime=None):
+        # 单词记录做成只读映射，防止某个会话意外修改共享数据
+        self.words = tuple(MappingProxyType(dict(word)) for word in words)
+        self.source = source
+        self.mtime = mtime
+
+        by_id = {}
+        by_unit = {}
+        by_type = {}
+        for pos, word in enumerate(self.words):
+            by_id[str(word["id"])] = pos
+            by_unit.setdefault(str(word.get("unit", "")), []).append(pos)
+            by_type.setdefault(word.get("type", ""), []).append(pos)
+
+        # 倒排索引：单元/词性 -> 单词位置（升序元组）
+        self._init_indexes(
+            by_id,
+            {unit: tuple(positions) for unit, positions in by_unit.items()},
+            {word_type: tuple(positions) for word_type, positions in by_type.items()},
+        )
+
+    # 设置 id、单元、词性索引，并初始化按需构建的搜索/干扰项索引和筛选视图缓存（子类共用）
+    def _init_indexes(self, pos_by_id, by_unit, by_type):
+        self.pos_by_id = pos_by_id
+        self.by_unit = by_unit
+        self.by_type = by_type
+        self.units = sorted(by_unit)
+        self.types = sorted(by_type)
+        self._search_index = None
+        self._distractor_index = None
+        self._views = {}
+        self._views_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __getitem__(self, pos):
+        return self.words[pos]
+
+    # 按 id 查找单词（id 可以是整数或字符串）
+    def get(self, word_id, default=None):
+        pos = self.pos_by_id.get(str(word_id))
+        return default if pos is None else self.words[pos]
+
+    # 搜索索引第一次使用时才构建
+    def search(self, query):
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.words)
+        return self._search_index.search(query)
+
+    # 不筛选时整个词库的干扰项索引，所有会话共用
+    def distractor_index(self):
+        if self._distractor_index is None:
+            self._distractor_index = DistractorIndex(self)
+        return self._distractor_index
+
+    # 按单元、词性筛选，返回升序的位置列表
+    def select(self, units=None, types=None):
+        if not units and not types:
+            return list(range(len(self.words)))
+
+        unit_positions = None
+        if units:
+            unit_positions = set()
+            for unit in units:
+                unit_positions.update(self.by_unit.get(str(unit), ()))
+
+        type_positions = None
+        if types:
+            type_positions = set()
+            for word_type in types:
+                type_positions.update(self.by_type.get(word_type, ()))
+
+        if unit_positions is None:
+            positions = type_positions
+        elif type_positions is None:
+            positions = unit_positions
+        else:
+            positions = unit_positions & type_positions
+        return sorted(positions)
+
+    # 按单元、词性筛选的视图，相同条件返回同一个对象（所有会话共享，条件不变时不重新计算）
+    def view(self, units=None, types=None):
+        key = (frozenset(str(unit) for unit in units or ()), frozenset(types or ()))
+        view = self._views.get(key)
+        if view is None:
+            view = WordView(self, self.select(units, types))
+            with self._views_lock:
+                if len(self._views) >= MAX_CACHED_VIEWS:
+                    self._views.clear()
+                view = self._views.setdefault(key, view)
+        return view
+
+    # 只保留 id 在 word_ids 中的单词，按 id 逐个查位置，与词库大小无关
+    def restrict(self, view, word_ids):
+        positions = []
+        # 先复制一份 id，其他会话可能同时修改同一个字典
+        for word_id in list(word_ids):
+            pos = self.pos_by_id.get(str(word_id))
+            if pos is not None and (view is self or view.has_position(pos)):
+                positions.append(pos)
+        positions.sort()
+        return WordView(self, positions)
+
+
+# 按单元、词性和已掌握单词筛选（known_words 为 None 时不按掌握情况筛选），结果是位置数组视图
+# 没有任何条件时直接返回词库本身，不复制
+def filter_words(vocab, units=None, types=None, known_words=None):
+    view = vocab.view(units, types) if units or types else vocab
+    if known_words is not None:
+        view = vocab.restrict(view, known_words)
+    return view
+
+
+COMPILED_SUFFIX = ".vocab"
+
+
+# 同名的编译词库（main.json -> main.vocab）存在且不比 JSON 旧时优先使用编译版本
+def vocabulary_file(path):
+    path = Path(path)
+    compiled = path.with_suffix(COMPILED_SUFFIX)
+    if path.suffix == COMPILED_SUFFIX or not compiled.exists():
+        return path
+    if not path.exists() or compiled.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+        return compiled
+    return path
+
+
+# 读取词库文件（JSON 或编译格式），不经过缓存
+def read_vocabulary(data_file, mtime=None):
+    data_file = Path(data_file)
+    with profiler.stage("disk:vocab_load"):
+        if data_file.suffix == COMPILED_SUFFIX:
+            # 延迟导入：compiled_vocab 依赖本模块的 Vocabulary
+            from compiled_vocab import CompiledVocabulary
+            return CompiledVocabulary(data_file, mtime=mtime)
+        with open(data_file, 'r', encoding='utf-8') as f:
+            word_data = json.load(f)
+        return Vocabulary(word_data, source=str(data_file.resolve()), mtime=mtime)
+
+
+# 获取共享词库，文件未修改时直接返回缓存对象
+def load_vocabulary(path):
+    path = Path(path)
+    data_file = vocabulary_file(path)
+    mtime = data_file.stat().st_mtime_ns
+    key = str(path.resolve())
+    source = str(data_file.resolve())
+
+    vocab = _vocab_cache.get(key)
+    if vocab is not None and vocab.source == source and vocab.mtime == mtime:
+        return vocab
+
+    with _vocab_lock:
+        # 加锁后再检查一次，避免多个会话同时解析同一个文件
+        vocab = _vocab_cache.get(key)
+        if vocab is None or vocab.source != source or vocab.mtime != mtime:
+            vocab = read_vocabulary(data_file, mtime)
+            _vocab_cache[key] = vocab
+    return vocab